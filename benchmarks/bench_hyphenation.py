@@ -0,0 +1,77 @@
+"""Порівняння hyphenation_string з попередньою реалізацією (конкатенація рядків) на 10 000 довгих нотаток.
+
+    python benchmarks/bench_hyphenation.py [--notes 10000] [--words 300] [--repeat 5]
+
+Головний показник - перший вивід нових текстів (кеш порожній), окремо для звичайного ASCII-тексту
+та для тексту з кирилицею, CJK, emoji і кольоровими escape-послідовностями; далі - повторний вивід (з кешу).
+"""
+import argparse
+import pathlib
+import random
+import sys
+from timeit import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from units.paginator import STRING_WIDTH, hyphenation_string  # noqa: E402
+
+ASCII_WORDS = ['note', 'buy', 'milk', 'meeting', 'tomorrow', 'project', 'deadline', '+380671234567', 'mail@example.com']
+WORDS = ['note', 'buy', 'milk', 'meeting', 'tomorrow', 'project', 'deadline', 'нотатка', 'зустріч', 'завтра',
+         'купити', 'молоко', 'проєкт', '+380671234567', 'mail@example.com', '\033[34mTags:\033[0m', '会议', '🙂']
+
+
+def legacy_hyphenation_string(text) -> str:
+    result, line = '', ''
+    text_list = text.split()
+    for word in text_list:
+        if not line:
+            line = word
+        elif len(line) + len(word) > STRING_WIDTH + 1:
+            result += line + '\n'
+            line = word
+        else:
+            line += ' ' + word
+    if line:
+        result += line
+    return result
+
+
+def make_notes(count: int, words: int, vocabulary: list) -> list:
+    rnd = random.Random(0)
+    return [' '.join(rnd.choices(vocabulary, k=words)) for _ in range(count)]
+
+
+def bench(name: str, func, notes: list, repeat: int) -> float:
+    seconds = min(timeit(lambda: [func(note) for note in notes], number=1) for _ in range(repeat))
+    print(f'{name:<40} {seconds * 1000:9.1f} ms  {len(notes) / seconds:12.0f} notes/s')
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    def cold(text):
+        hyphenation_string.cache_clear()
+        return hyphenation_string(text)
+
+    for title, vocabulary in (('ASCII', ASCII_WORDS), ('mixed', WORDS)):
+        notes = make_notes(args.notes, args.words, vocabulary)
+        legacy = bench(f'{title}: legacy (+=)', legacy_hyphenation_string, notes, args.repeat)
+        first = bench(f'{title}: hyphenation_string, no cache', cold, notes, args.repeat)
+        print(f'{title} cold path: {len(notes) / first:.0f} notes/s, x{legacy / first:.2f} of legacy')
+
+    hyphenation_string.cache_clear()
+    for note in notes:
+        hyphenation_string(note)
+    # Повторний вивід: у кеші вміщується HYPHENATION_CACHE останніх текстів
+    cached = notes[-min(len(notes), hyphenation_string.cache_info().maxsize):]
+    warm = bench('mixed: hyphenation_string, cached', hyphenation_string, cached, args.repeat)
+    print(f'cached: x{legacy / warm * len(cached) / len(notes):.1f} of legacy')
+
+
+if __name__ == '__main__':
+    main()
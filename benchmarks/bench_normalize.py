@@ -0,0 +1,79 @@
+"""Порівняння normalize з попередньою реалізацією (translate + re.sub) на 1 000 000 імен файлів.
+
+    python benchmarks/bench_normalize.py [--names 1000000] [--repeat 3]
+
+Частина імен повторюється, як у реальних теках. Для нової реалізації - прохід без кешу, з кешем
+та з кешем лише на повторюваних іменах; наприкінці перевіряється, що імена, призначені в одному пакеті
+(free_target, як у плані сортувальника), не збігаються.
+"""
+import argparse
+import pathlib
+import random
+import re
+import sys
+from timeit import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from units.file_ops import TakenNames, free_target  # noqa: E402
+from units.normalize import CYRILLIC_SYMBOLS, TRANSLATION, normalize  # noqa: E402
+
+WORDS = ['IMG', 'DSC', 'Screenshot', 'report', 'final', 'copy', 'звіт', 'фото', 'відпустка', 'Знімок екрана',
+         'Café', 'déjà vu', 'Ελληνικά', 'straße', '会议', 'v2.1', '(1)', '[draft]', 'new file', "п'ятниця"]
+REPEATED = 0.3  # частка імен зі спільного набору з 1000 імен
+
+
+LEGACY_TRANS = {}
+for c, l in zip(CYRILLIC_SYMBOLS, TRANSLATION):
+    LEGACY_TRANS[ord(c)] = l
+    LEGACY_TRANS[ord(c.upper())] = l.title()
+
+
+def legacy_normalize(name: str) -> str:
+    t_name = name.translate(LEGACY_TRANS)
+    t_name = re.sub(r'\W', '_', t_name)
+    return t_name
+
+
+def make_names(count: int) -> (list, list):
+    """(усі імена, лише повторювані імена)"""
+    rnd = random.Random(0)
+    common = [f'{rnd.choice(WORDS)}_{number:04d}' for number in range(1000)]
+    names = [rnd.choice(common) if rnd.random() < REPEATED else
+             ' '.join(rnd.choices(WORDS, k=rnd.randrange(1, 4))) + f' {rnd.randrange(100000)}' for _ in range(count)]
+    return names, [rnd.choice(common) for _ in range(count)]
+
+
+def bench(name: str, func, names: list, repeat: int) -> float:
+    seconds = min(timeit(lambda: [func(item) for item in names], number=1) for _ in range(repeat))
+    print(f'{name:<28} {seconds * 1000:9.1f} ms  {len(names) / seconds:12.0f} names/s')
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    names, repeated = make_names(args.names)
+
+    legacy = bench('legacy (translate + re.sub)', legacy_normalize, names, args.repeat)
+    uncached = bench('normalize, no cache', normalize.__wrapped__, names, args.repeat)
+    normalize.cache_clear()
+    cached = bench('normalize, cached', normalize, names, args.repeat)
+    print(f'speedup: x{legacy / uncached:.1f} without cache, x{legacy / cached:.1f} with cache')
+    repeated_legacy = bench('legacy, repeated names', legacy_normalize, repeated, args.repeat)
+    normalize.cache_clear()
+    repeated_cached = bench('normalize, repeated names', normalize, repeated, args.repeat)
+    print(f'speedup on repeated names: x{repeated_legacy / repeated_cached:.1f}')
+
+    # Одна тека, якої немає на диску: збіги розв'язуються лише за множиною вже призначених імен
+    folder, taken = pathlib.Path(__file__).parent / 'no such folder', TakenNames()
+    targets = [free_target(folder / normalize(name), taken) for name in names]
+    collisions = sum(target.name != normalize(name) for target, name in zip(targets, names))
+    assert len(set(targets)) == len(targets)
+    print(f'{len(targets)} unique names, {collisions} renamed to avoid collisions')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,25 @@
-from prompt_toolkit import prompt
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+import argparse
+import json
+import sys
+
 from prompt_toolkit.completion import NestedCompleter
-from prompt_toolkit.history import FileHistory
 
 from units.adressbook import start_ab
+from units.batch import start_batch
 from units.file_parser import start_fp
-from units.command_parser import RainbowLexer
+from units.command_parser import prompt_session
 from units.notebook import start_nb
 
 
 def start():
+    session_prompt = prompt_session('main', NestedCompleter.from_nested_dict({'addressbook': None, 'notebook': None,
+                                                                             'file parser': None, 'quit': None}))
     while True:
-        with open("history.txt", "wb"):
-            pass
         print("")
         print("{:^70}".format("\033[34m What would you like to start with?\033[0m \n"))
         print("{:<25} {:<25} {:<25} {:<25}".format("\033[32m addressbook \033[0m", "\033[32m notebook \033[0m",
                                                    "\033[32m file parser \033[0m", "\033[32m quit \033[0m \n"))
-        user_input = prompt("Enter command >>> ",
-                            history=FileHistory('history.txt'),
-                            auto_suggest=AutoSuggestFromHistory(),
-                            completer=NestedCompleter.from_nested_dict({'addressbook': None, 'notebook': None,
-                                                                        'file parser': None, 'quit': None}),
-                            lexer=RainbowLexer()
-                            )
+        user_input = session_prompt.prompt("Enter command >>> ")
         if user_input == "addressbook":
             start_ab()
         if user_input == "notebook":
@@ -35,5 +31,25 @@ def start():
             break
 
 
+def main():
+    parser = argparse.ArgumentParser(description='Personal assistant: addressbook, notebook and file parser')
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="run addressbook/notebook commands from FILE (or stdin), JSON lines output")
+    parser.add_argument('--yes', action='store_true', help='answer yes to confirmations in batch mode')
+    parser.add_argument('--commit-every', type=int, default=1000, metavar='N',
+                        help='commit the batch transaction every N commands (default 1000)')
+    args = parser.parse_args()
+    if args.batch is None:
+        start()
+        return
+    if args.commit_every < 1:
+        parser.error('--commit-every must be positive')
+    try:
+        summary = start_batch(args.batch, args.yes, args.commit_every)
+    except OSError as error:
+        parser.exit(1, f'Error! {error}\n')
+    print(json.dumps(summary), file=sys.stderr)
+
+
 if __name__ == '__main__':
-    start()
+    main()
@@ -4,6 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
+from src.db import url
 from src.models import Base
 
 # this is the Alembic Config object, which provides
@@ -21,6 +22,9 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+# Адреса бази береться з config.ini (src/db.py), а не з alembic.ini
+config.set_main_option('sqlalchemy.url', url.replace('%', '%%'))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
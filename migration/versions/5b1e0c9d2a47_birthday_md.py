@@ -0,0 +1,32 @@
+"""Add indexed birthday_md
+
+Revision ID: 5b1e0c9d2a47
+Revises: cd76d8f710c5
+Create Date: 2026-10-18 10:12:41.530216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0c9d2a47'
+down_revision = 'cd76d8f710c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_md', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE contacts SET birthday_md = CAST(strftime('%m%d', birthday) AS INTEGER) "
+                   "WHERE birthday IS NOT NULL")
+    else:
+        op.execute('UPDATE contacts SET birthday_md = EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) '
+                   'WHERE birthday IS NOT NULL')
+    op.create_index(op.f('ix_contacts_birthday_md'), 'contacts', ['birthday_md'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_contacts_birthday_md'), table_name='contacts')
+    op.drop_column('contacts', 'birthday_md')
@@ -0,0 +1,69 @@
+"""Contact search indexes
+
+Revision ID: 8d4f2a6c1e93
+Revises: 5b1e0c9d2a47
+Create Date: 2026-10-18 11:02:17.904551
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4f2a6c1e93'
+down_revision = '5b1e0c9d2a47'
+branch_labels = None
+depends_on = None
+
+TRGM_INDEXES = (('ix_contacts_name_trgm', 'contacts', 'name'),
+                ('ix_phones_phone_number_trgm', 'phones', 'phone_number'),
+                ('ix_emails_mail_trgm', 'emails', 'mail'))
+
+# SQLite: одна FTS5-таблиця з триграмним токенізатором, rowid = contacts.id
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE contacts_fts USING fts5(name, phones, emails, tokenize='trigram')",
+    "INSERT INTO contacts_fts(rowid, name, phones, emails) "
+    "SELECT c.id, c.name, "
+    "coalesce((SELECT group_concat(phone_number, ' ') FROM phones WHERE contact_id = c.id), ''), "
+    "coalesce((SELECT group_concat(mail, ' ') FROM emails WHERE contact_id = c.id), '') FROM contacts c",
+    "CREATE TRIGGER contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, name, phones, emails) VALUES (new.id, new.name, '', ''); END",
+    "CREATE TRIGGER contacts_fts_au AFTER UPDATE OF name ON contacts BEGIN "
+    "UPDATE contacts_fts SET name = new.name WHERE rowid = new.id; END",
+    "CREATE TRIGGER contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "DELETE FROM contacts_fts WHERE rowid = old.id; END",
+)
+
+
+def sqlite_child_triggers(table: str, column: str, fts_column: str) -> list:
+    refresh = (f"UPDATE contacts_fts SET {fts_column} = coalesce((SELECT group_concat({column}, ' ') FROM {table} "
+               f"WHERE contact_id = {{row}}.contact_id), '') WHERE rowid = {{row}}.contact_id;")
+    return [
+        f"CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN {refresh.format(row='new')} END",
+        f"CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN {refresh.format(row='old')} END",
+        f"CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN "
+        f"{refresh.format(row='old')} {refresh.format(row='new')} END",
+    ]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_FTS + tuple(sqlite_child_triggers('phones', 'phone_number', 'phones')) + \
+                tuple(sqlite_child_triggers('emails', 'mail', 'emails')):
+            op.execute(statement)
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table, column in TRGM_INDEXES:
+        op.create_index(index_name, table, [column], unique=False, postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('contacts', 'phones', 'emails'):
+            for suffix in ('ai', 'au', 'ad'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+        op.execute('DROP TABLE IF EXISTS contacts_fts')
+        return
+    for index_name, table, column in TRGM_INDEXES:
+        op.drop_index(index_name, table_name=table)
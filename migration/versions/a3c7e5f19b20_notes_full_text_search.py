@@ -0,0 +1,102 @@
+"""Notes full-text search
+
+Revision ID: a3c7e5f19b20
+Revises: 8d4f2a6c1e93
+Create Date: 2026-10-18 11:48:05.117342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c7e5f19b20'
+down_revision = '8d4f2a6c1e93'
+branch_labels = None
+depends_on = None
+
+# PostgreSQL: notes.search_vector (текст + теги) підтримується тригерами, в моделі Note його немає
+POSTGRESQL_UPGRADE = (
+    """CREATE FUNCTION notes_search_vector(note_text text, note_id integer) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(
+                   (SELECT string_agg(tag, ' ') FROM tags WHERE tags.note_id = $2), '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce($1, '')), 'B')
+    $$ LANGUAGE sql STABLE""",
+    """CREATE FUNCTION notes_search_vector_note() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := notes_search_vector(NEW.text, NEW.id);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE FUNCTION notes_search_vector_tag() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            UPDATE notes SET search_vector = notes_search_vector(text, id) WHERE id = OLD.note_id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            UPDATE notes SET search_vector = notes_search_vector(text, id) WHERE id = NEW.note_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER notes_search_vector_update BEFORE INSERT OR UPDATE OF text ON notes
+        FOR EACH ROW EXECUTE FUNCTION notes_search_vector_note()""",
+    """CREATE TRIGGER tags_search_vector_update AFTER INSERT OR UPDATE OR DELETE ON tags
+        FOR EACH ROW EXECUTE FUNCTION notes_search_vector_tag()""",
+    "UPDATE notes SET search_vector = notes_search_vector(text, id)",
+)
+
+POSTGRESQL_DOWNGRADE = (
+    'DROP TRIGGER IF EXISTS tags_search_vector_update ON tags',
+    'DROP TRIGGER IF EXISTS notes_search_vector_update ON notes',
+    'DROP FUNCTION IF EXISTS notes_search_vector_tag()',
+    'DROP FUNCTION IF EXISTS notes_search_vector_note()',
+    'DROP FUNCTION IF EXISTS notes_search_vector(text, integer)',
+)
+
+# SQLite: FTS5-таблиця notes_fts, rowid = notes.id
+SQLITE_TAGS = "coalesce((SELECT group_concat(tag, ' ') FROM tags WHERE note_id = {row}.note_id), '')"
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE notes_fts USING fts5(text, tags, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO notes_fts(rowid, text, tags) SELECT n.id, n.text, "
+    "coalesce((SELECT group_concat(tag, ' ') FROM tags WHERE note_id = n.id), '') FROM notes n",
+    "CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes BEGIN "
+    "INSERT INTO notes_fts(rowid, text, tags) VALUES (new.id, new.text, ''); END",
+    "CREATE TRIGGER notes_fts_au AFTER UPDATE OF text ON notes BEGIN "
+    "UPDATE notes_fts SET text = new.text WHERE rowid = new.id; END",
+    "CREATE TRIGGER notes_fts_ad AFTER DELETE ON notes BEGIN "
+    "DELETE FROM notes_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER tags_fts_ai AFTER INSERT ON tags BEGIN "
+    f"UPDATE notes_fts SET tags = {SQLITE_TAGS.format(row='new')} WHERE rowid = new.note_id; END",
+    "CREATE TRIGGER tags_fts_ad AFTER DELETE ON tags BEGIN "
+    f"UPDATE notes_fts SET tags = {SQLITE_TAGS.format(row='old')} WHERE rowid = old.note_id; END",
+    "CREATE TRIGGER tags_fts_au AFTER UPDATE ON tags BEGIN "
+    f"UPDATE notes_fts SET tags = {SQLITE_TAGS.format(row='old')} WHERE rowid = old.note_id; "
+    f"UPDATE notes_fts SET tags = {SQLITE_TAGS.format(row='new')} WHERE rowid = new.note_id; END",
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+        return
+    op.add_column('notes', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    for statement in POSTGRESQL_UPGRADE:
+        op.execute(statement)
+    op.create_index('ix_notes_search_vector', 'notes', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for suffix in ('ai', 'au', 'ad'):
+            op.execute(f'DROP TRIGGER IF EXISTS notes_fts_{suffix}')
+            op.execute(f'DROP TRIGGER IF EXISTS tags_fts_{suffix}')
+        op.execute('DROP TABLE IF EXISTS notes_fts')
+        return
+    op.drop_index('ix_notes_search_vector', table_name='notes')
+    for statement in POSTGRESQL_DOWNGRADE:
+        op.execute(statement)
+    op.drop_column('notes', 'search_vector')
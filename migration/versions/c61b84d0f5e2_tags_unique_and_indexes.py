@@ -0,0 +1,28 @@
+"""Unique tags per note and tag indexes
+
+Revision ID: c61b84d0f5e2
+Revises: a3c7e5f19b20
+Create Date: 2026-10-18 12:20:44.603918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c61b84d0f5e2'
+down_revision = 'a3c7e5f19b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Прибираємо дублікати тегів, залишаючи найстаріший запис
+    op.execute('DELETE FROM tags WHERE id NOT IN (SELECT min(id) FROM tags GROUP BY note_id, tag)')
+    op.create_index('uq_tags_note_id_tag', 'tags', ['note_id', 'tag'], unique=True)
+    op.create_index('ix_tags_tag_note_id', 'tags', ['tag', 'note_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tags_tag_note_id', table_name='tags')
+    op.drop_index('uq_tags_note_id_tag', table_name='tags')
@@ -0,0 +1,26 @@
+"""Index phones and emails by contact
+
+Revision ID: e2f90a7b3c18
+Revises: c61b84d0f5e2
+Create Date: 2026-10-18 13:05:52.281730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f90a7b3c18'
+down_revision = 'c61b84d0f5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_phones_contact_id'), 'phones', ['contact_id'], unique=False)
+    op.create_index(op.f('ix_emails_contact_id'), 'emails', ['contact_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_emails_contact_id'), table_name='emails')
+    op.drop_index(op.f('ix_phones_contact_id'), table_name='phones')
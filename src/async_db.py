@@ -0,0 +1,36 @@
+"""Асинхронне підключення до бази (asyncpg / aiosqlite) з тими ж налаштуваннями config.ini, що й src/db.py"""
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src import db
+from src.db import driver, url, pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping
+
+if driver == 'sqlite':
+    async_url = url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+    async_engine = create_async_engine(async_url, echo=False, pool_pre_ping=pool_pre_ping,
+                                       connect_args={'timeout': pool_timeout})
+    event.listen(async_engine.sync_engine, 'connect', db.sqlite_connect)
+
+    @event.listens_for(async_engine.sync_engine, 'begin')
+    def sqlite_begin_immediate(connection):
+        # SQLite має одного записувача: одночасні транзакції чекають на блокування замість "database is locked"
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+else:
+    async_url = url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    async_engine = create_async_engine(async_url, echo=False, pool_size=pool_size, max_overflow=max_overflow,
+                                       pool_timeout=pool_timeout, pool_recycle=pool_recycle,
+                                       pool_pre_ping=pool_pre_ping)
+
+# expire_on_commit=False: після commit об'єкти лишаються придатними до читання без нових запитів
+AsyncDBSession = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """Сесія на одну операцію: commit при успіху, rollback при помилці"""
+    async with AsyncDBSession() as session:
+        async with session.begin():
+            yield session
@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker, scoped_session
+from contextlib import contextmanager
+from time import time
 import configparser
 import pathlib
 
@@ -15,10 +19,184 @@ password = config.get('DB', 'password')
 domain_name = config.get('DB', 'domain')
 database_name = config.get('DB', 'db_name')
 
-url = f'postgresql://{username}:{password}@{domain_name}:5432/{database_name}'
+# DRIVER=sqlite - локальна база у файлі <DB_NAME>.sqlite3 поруч з config.ini
+driver = config.get('DB', 'driver', fallback='postgresql')
+
+# Пул з'єднань PostgreSQL
+pool_size = config.getint('DB', 'pool_size', fallback=5)
+max_overflow = config.getint('DB', 'max_overflow', fallback=10)
+pool_timeout = config.getint('DB', 'pool_timeout', fallback=30)  # секунд очікування вільного з'єднання
+pool_recycle = config.getint('DB', 'pool_recycle', fallback=1800)  # секунд, після яких з'єднання перевідкривається
+# Перевірка з'єднання перед видачею з пулу: розірвані з'єднання замінюються новими автоматично
+pool_pre_ping = config.getboolean('DB', 'pool_pre_ping', fallback=True)
+
+if driver == 'sqlite':
+    url = f"sqlite:///{file_config.parent.joinpath(database_name + '.sqlite3')}"
+else:
+    url = f'postgresql://{username}:{password}@{domain_name}:5432/{database_name}'
 
 Base = declarative_base()
-engine = create_engine(url, echo=False, pool_size=5)
+if driver == 'sqlite':
+    engine = create_engine(url, echo=False, pool_pre_ping=pool_pre_ping)
+
+    @event.listens_for(engine, 'connect')
+    def sqlite_connect(dbapi_connection, connection_record):
+        # Без цього SQLite ігнорує ON DELETE CASCADE
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+        # Транзакції відкриває SQLAlchemy (sqlite_begin), а не драйвер, інакше не працюють SAVEPOINT
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def sqlite_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+else:
+    engine = create_engine(url, echo=False, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout,
+                           pool_recycle=pool_recycle, pool_pre_ping=pool_pre_ping)
 
 DBSession = sessionmaker(bind=engine)
-session = DBSession()
+# Сесія свого потоку; після кожної команди звільняється (session_scope), тож identity map не росте
+session = scoped_session(DBSession)
+
+
+class UnitOfWork:
+    """Фіксація змін команд, що змінюють дані.
+
+    За замовчуванням кожна команда - окрема транзакція. У пакетному режимі (start_batch) команди
+    виконуються у спільній транзакції, кожна під своїм SAVEPOINT (помилка однієї команди не скасовує
+    інших), а COMMIT виконується після batch_size команд, якщо з першої незафіксованої команди минуло
+    batch_timeout секунд, або явно через commit().
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.batch_size = 0  # 0 - пакетний режим вимкнено
+        self.batch_timeout = None
+        self.pending = 0
+        self.started = None
+        self.contained = None  # остання помилка, відкочена до SAVEPOINT своєї команди
+
+    @property
+    def active(self) -> bool:
+        return self.batch_size > 0
+
+    def start_batch(self, size: int = 100, timeout: float = None):
+        if size < 1:
+            raise ValueError('Batch size must be positive')
+        self.batch_size = size
+        self.batch_timeout = timeout
+
+    def stop_batch(self) -> int:
+        committed = self.commit()
+        self.batch_size = 0
+        self.batch_timeout = None
+        return committed
+
+    def commit(self) -> int:
+        """Фіксує транзакцію, повертає кількість зафіксованих команд"""
+        self.session.commit()
+        committed, self.pending, self.started = self.pending, 0, None
+        return committed
+
+    def rollback(self) -> int:
+        self.session.rollback()
+        discarded, self.pending, self.started = self.pending, 0, None
+        return discarded
+
+    def release(self):
+        """Завершує транзакцію читання, якщо в ній немає незафіксованих команд пакета.
+
+        З'єднання повертається в пул, а блокування бази знімаються, поки програма чекає на користувача;
+        наступний запит сесії почне нову транзакцію.
+        """
+        if not self.pending:
+            self.session.close()
+
+    def is_lost(self, error: DBAPIError) -> bool:
+        """Чи непридатна транзакція пакета після помилки error.
+
+        Помилку команди, відкочену до її SAVEPOINT, транзакція переживає: решта незафіксованих команд
+        пакета лишається. Втрачена транзакція - розірване з'єднання, неактивна сесія або помилка поза командою.
+        """
+        return error.connection_invalidated or not self.session.is_active or error is not self.contained
+
+    def is_expired(self) -> bool:
+        return self.started is not None and self.batch_timeout is not None \
+            and time() - self.started >= self.batch_timeout
+
+    def expires_in(self):
+        """Секунд до фіксації пакета за batch_timeout або None, якщо незафіксованих команд немає чи таймер не задано"""
+        if self.started is None or self.batch_timeout is None:
+            return None
+        return max(self.started + self.batch_timeout - time(), 0)
+
+    def commit_expired(self) -> int:
+        """Фіксує пакет, якщо минув batch_timeout; повертає кількість зафіксованих команд"""
+        return self.commit() if self.is_expired() else 0
+
+    @contextmanager
+    def command(self):
+        if not self.active:
+            try:
+                yield self.session
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+            return
+
+        if self.is_expired():
+            self.commit()
+        savepoint = self.session.begin_nested()
+        try:
+            yield self.session
+            savepoint.commit()
+        except Exception as error:
+            # Відкочуємо лише цю команду, в тому числі коли помилка виникла під час flush у savepoint.commit()
+            savepoint.rollback()
+            self.contained = error
+            raise
+        self.pending += 1
+        if self.started is None:
+            self.started = time()
+        if self.pending >= self.batch_size or self.is_expired():
+            self.commit()
+
+
+unit_of_work = UnitOfWork(session)
+
+
+@contextmanager
+def session_scope():
+    """Час життя сесії - одна команда REPL (або незафіксований пакет команд у пакетному режимі).
+
+    Помилки бази (розірване з'єднання тощо) не завершують програму: транзакція відкочується,
+    сесія закривається, а наступна команда отримає нову сесію та живе з'єднання з пулу.
+    """
+    try:
+        yield session
+    except DBAPIError as error:
+        if not unit_of_work.is_lost(error):
+            # Команду вже відкочено до її SAVEPOINT (UnitOfWork.command), незафіксовані команди пакета лишаються
+            print(f'Error! Database error: {error.orig}\n')
+            if not unit_of_work.pending:
+                session.remove()
+            return
+        lost = unit_of_work.pending
+        try:
+            unit_of_work.rollback()
+        except DBAPIError:
+            pass
+        session.remove()
+        print(f'Error! Database error, {lost} pending command(s) discarded: {error.orig}\n')
+    else:
+        if not unit_of_work.pending:
+            session.remove()
+
+
+def dialect_insert(entity):
+    """insert() діалекту бази, з підтримкою on_conflict_do_nothing / on_conflict_do_update"""
+    if driver == 'sqlite':
+        return sqlite.insert(entity)
+    return postgresql.insert(entity)
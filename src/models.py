@@ -1,19 +1,40 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, FetchedValue
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, FetchedValue, Index, or_, false
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
-from sqlalchemy.orm import relationship, column_property
-from datetime import date, datetime
+from sqlalchemy.orm import relationship, column_property, validates
+from datetime import date, datetime, timedelta
+import calendar
 
 from src.db import Base
 
 
+def birthday_key(birthday: date):
+    """Ключ дня народження у вигляді числа MMDD (5 березня -> 305), за яким працює індекс"""
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
+
+
+def birthday_in_year(birthday: date, year: int) -> date:
+    # 29 лютого в невисокосний рік святкуємо 1 березня
+    if birthday.month == 2 and birthday.day == 29 and not calendar.isleap(year):
+        return date(year, 3, 1)
+    return date(year, birthday.month, birthday.day)
+
+
 class Contact(Base):
     __tablename__ = 'contacts'
     id = Column(Integer, primary_key=True)
     name = Column(String(30), unique=True, nullable=False)
     address = Column(String(100), nullable=True)
     birthday = Column(Date, nullable=True)
-    phones = relationship('Phone', back_populates='contact')
-    emails = relationship('Email', back_populates='contact')
+    birthday_md = Column(Integer, nullable=True, index=True)  # birthday_key(birthday), оновлюється автоматично
+    phones = relationship('Phone', back_populates='contact', order_by='Phone.phone_number')
+    emails = relationship('Email', back_populates='contact', order_by='Email.mail')
+
+    @validates('birthday')
+    def validate_birthday(self, key, birthday):
+        self.birthday_md = birthday_key(birthday)
+        return birthday
 
     @hybrid_property
     def days_to_birthday(self) -> int:
@@ -21,17 +42,37 @@ class Contact(Base):
         if self.birthday is None:
             return -1
         this_day = date.today()
-        birthday_day = date(this_day.year, self.birthday.month, self.birthday.day)
+        birthday_day = birthday_in_year(self.birthday, this_day.year)
         if birthday_day < this_day:
-            birthday_day = date(this_day.year + 1, self.birthday.month, self.birthday.day)
+            birthday_day = birthday_in_year(self.birthday, this_day.year + 1)
         return int((birthday_day - this_day).days)
 
+    @hybrid_method
+    def birthday_within(self, days: int) -> bool:
+        return 0 <= self.days_to_birthday <= days
+
+    @birthday_within.expression
+    def birthday_within(cls, days: int):
+        # Вікно [сьогодні, сьогодні + days] як діапазон по індексованому birthday_md
+        if days < 0:
+            return false()
+        if days >= 365:
+            return cls.birthday_md != None
+        this_day = date.today()
+        start, end = birthday_key(this_day), birthday_key(this_day + timedelta(days=days))
+        if start == 301 and not calendar.isleap(this_day.year):
+            start = 229
+        if start <= end:
+            return cls.birthday_md.between(start, end)
+        # Вікно переходить через кінець року
+        return or_(cls.birthday_md >= start, cls.birthday_md <= end)
+
 
 class Phone(Base):
     __tablename__ = 'phones'
     id = Column(Integer, primary_key=True)
     phone_number = Column(String(15), unique=True, nullable=False)
-    contact_id = Column(Integer, ForeignKey('contacts.id', ondelete='CASCADE'), nullable=False)
+    contact_id = Column(Integer, ForeignKey('contacts.id', ondelete='CASCADE'), nullable=False, index=True)
     contact = relationship('Contact', back_populates='phones')
 
 
@@ -39,14 +80,14 @@ class Email(Base):
     __tablename__ = 'emails'
     id = Column(Integer, primary_key=True)
     mail = Column(String(254), unique=True, nullable=False)
-    contact_id = Column(Integer, ForeignKey('contacts.id', ondelete='CASCADE'), nullable=False)
+    contact_id = Column(Integer, ForeignKey('contacts.id', ondelete='CASCADE'), nullable=False, index=True)
     contact = relationship('Contact', back_populates='emails')
 
 
 class Note(Base):
     __tablename__ = 'notes'
     id = Column(Integer, primary_key=True)
-    tags = relationship('Tag')
+    tags = relationship('Tag', order_by='Tag.tag')
     text = Column(String(255), nullable=False)
     execution_date = Column(Date)
     is_done = Column(Boolean, default=False)
@@ -54,6 +95,10 @@ class Note(Base):
 
 class Tag(Base):
     __tablename__ = 'tags'
+    __table_args__ = (
+        Index('uq_tags_note_id_tag', 'note_id', 'tag', unique=True),
+        Index('ix_tags_tag_note_id', 'tag', 'note_id'),  # пошук і сортування за тегом
+    )
     id = Column(Integer, primary_key=True)
     tag = Column(String(15), nullable=False)
     note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
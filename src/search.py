@@ -0,0 +1,82 @@
+"""Індексований пошук: pg_trgm і tsvector у PostgreSQL, FTS5 у SQLite (див. міграції 8d4f2a6c1e93, a3c7e5f19b20)"""
+import re
+
+from sqlalchemy import func, select, union, or_, table, column, literal, literal_column, false
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from src.models import Contact, Phone, Email, Note
+
+contacts_fts = table('contacts_fts', column('rowid'), column('name'), column('phones'), column('emails'))
+notes_fts = table('notes_fts', column('rowid'))
+notes_search_vector = literal_column('notes.search_vector', type_=TSVECTOR)
+
+
+def fts_phrase(text: str) -> str:
+    # Рядок як одна фраза FTS5, лапки всередині подвоюються
+    return '"' + text.replace('"', '""') + '"'
+
+
+def dialect_name(query) -> str:
+    # ORM Query знає свою сесію; для select() (AsyncSession) діалект передається явно
+    return query.session.get_bind().dialect.name
+
+
+def search_contacts(query, substr: str, dialect: str = None):
+    """Обмежує query (Query або select()) контактами, у яких substr є в імені, телефоні або пошті.
+
+    Повертає (query, rank), де rank - вираз релевантності (менше - краще), придатний як ключ сортування.
+    Кожен контакт потрапляє у вибірку один раз, скільки б його телефонів чи адрес не збіглося.
+    """
+    dialect = dialect or dialect_name(query)
+    if dialect == 'sqlite':
+        if len(substr) >= 3:
+            # Триграмний токенізатор шукає фразу як підрядок
+            condition = literal_column('contacts_fts').op('MATCH')(fts_phrase(substr))
+            rank = func.bm25(literal_column('contacts_fts'))
+        else:
+            pattern = f'%{substr}%'
+            condition = or_(contacts_fts.c.name.like(pattern), contacts_fts.c.phones.like(pattern),
+                            contacts_fts.c.emails.like(pattern))
+            rank = literal(0)
+        matched = select(contacts_fts.c.rowid.label('contact_id'), rank.label('rank')).where(condition).subquery()
+        return query.join(matched, Contact.id == matched.c.contact_id), matched.c.rank
+
+    # Кожна гілка UNION використовує свій GIN-індекс gin_trgm_ops, UNION прибирає дублікати
+    pattern = f'%{substr}%'
+    matched = union(select(Contact.id).where(Contact.name.ilike(pattern)),
+                    select(Phone.contact_id).where(Phone.phone_number.ilike(pattern)),
+                    select(Email.contact_id).where(Email.mail.ilike(pattern)))
+    query = query.filter(Contact.id.in_(matched))
+    if dialect != 'postgresql':
+        return query, literal(0).label('rank')
+    phone_similarity = select(func.max(func.word_similarity(substr, Phone.phone_number))) \
+        .where(Phone.contact_id == Contact.id).scalar_subquery()
+    email_similarity = select(func.max(func.word_similarity(substr, Email.mail))) \
+        .where(Email.contact_id == Contact.id).scalar_subquery()
+    similarity = func.greatest(func.word_similarity(substr, Contact.name), func.coalesce(phone_similarity, 0),
+                               func.coalesce(email_similarity, 0))
+    return query, (1 - similarity).label('rank')
+
+
+def search_terms(text: str) -> list:
+    return re.findall(r'\w+', text.lower())
+
+
+def search_notes(query, text: str, dialect: str = None):
+    """Обмежує query (Query або select()) нотатками, текст або теги яких містять усі слова з text (кожне слово - як префікс).
+
+    Повертає (query, rank), де rank - вираз релевантності (менше - краще); збіг у тегах важить більше,
+    ніж у тексті.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return query.filter(false()), literal(0).label('rank')
+    if (dialect or dialect_name(query)) == 'sqlite':
+        fts_query = ' '.join(f'{fts_phrase(term)}*' for term in terms)
+        rank = func.bm25(literal_column('notes_fts'), 1.0, 2.0)
+        matched = select(notes_fts.c.rowid.label('note_id'), rank.label('rank')) \
+            .where(literal_column('notes_fts').op('MATCH')(fts_query)).subquery()
+        return query.join(matched, Note.id == matched.c.note_id), matched.c.rank
+    ts_query = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+    rank = (-func.ts_rank(notes_search_vector, ts_query)).label('rank')
+    return query.filter(notes_search_vector.op('@@')(ts_query)), rank
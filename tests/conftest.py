@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def db_session(tmp_path):
+    """Сесія окремої бази SQLite з таблицями моделей, налаштованої так само, як src.db для DRIVER=sqlite"""
+    # Імпорт тут, а не на рівні модуля: тести без бази не залежать від драйвера з config.ini
+    from src.db import Base
+    import src.models  # noqa: F401 - таблиці моделей реєструються в Base.metadata
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite3'}")
+
+    @event.listens_for(engine, 'connect')
+    def sqlite_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def sqlite_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
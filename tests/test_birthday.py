@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+
+from src import models
+from src.models import Contact
+
+
+def freeze_today(monkeypatch, today: date):
+    class FrozenDate(date):
+        @classmethod
+        def today(cls):
+            return today
+
+    monkeypatch.setattr(models, 'date', FrozenDate)
+
+
+def within(session, days):
+    query = session.query(Contact.name).filter(Contact.birthday_within(days)).order_by(Contact.name)
+    return [name for name, in query]
+
+
+@pytest.fixture
+def contacts(db_session):
+    birthdays = {'december': date(1990, 12, 30), 'january': date(1985, 1, 2), 'leap': date(2000, 2, 29),
+                 'march': date(1970, 3, 1), 'june': date(1999, 6, 15)}
+    db_session.add_all(Contact(name=name, birthday=birthday) for name, birthday in birthdays.items())
+    db_session.add(Contact(name='unknown'))
+    db_session.commit()
+    return db_session
+
+
+def test_birthday_window_across_year_end(contacts, monkeypatch):
+    freeze_today(monkeypatch, date(2022, 12, 29))
+    assert within(contacts, 5) == ['december', 'january']
+    assert within(contacts, 1) == ['december']
+    assert [contact.name for contact in contacts.query(Contact) if contact.birthday_within(5)] == \
+           ['december', 'january']
+
+
+def test_feb_29_birthday_in_common_and_leap_years(contacts, monkeypatch):
+    freeze_today(monkeypatch, date(2023, 2, 28))
+    assert within(contacts, 1) == ['leap', 'march']
+    leap = contacts.query(Contact).filter_by(name='leap').one()
+    assert leap.days_to_birthday == 1
+
+    freeze_today(monkeypatch, date(2023, 3, 1))
+    assert within(contacts, 0) == ['leap', 'march']
+
+    freeze_today(monkeypatch, date(2024, 2, 28))
+    assert within(contacts, 1) == ['leap']
+    assert leap.days_to_birthday == 1
+
+
+def test_birthday_window_limits(contacts, monkeypatch):
+    freeze_today(monkeypatch, date(2022, 6, 1))
+    assert within(contacts, -1) == []
+    assert within(contacts, 365) == ['december', 'january', 'june', 'leap', 'march']
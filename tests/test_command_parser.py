@@ -0,0 +1,36 @@
+from units.command_parser import CommandDispatcher, unknown_command
+
+
+def show(*args):
+    pass
+
+
+def show_all(*args):
+    pass
+
+
+def address(*args):
+    pass
+
+
+def help_(*args):
+    pass
+
+
+DISPATCHER = CommandDispatcher({show: ['show '], show_all: ['show all'], address: ['address'], help_: ['?']})
+
+
+def test_longest_alias_wins_regardless_of_order():
+    assert CommandDispatcher({show_all: ['show all'], show: ['show ']}).parse('show all 5') == (show_all, ['5'])
+    assert DISPATCHER.parse('show all 5') == (show_all, ['5'])
+    assert DISPATCHER.parse('  SHOW   ALL') == (show_all, [])
+
+
+def test_alias_must_end_at_word_boundary():
+    assert DISPATCHER.parse('show alliance') == (show, ['alliance'])
+    assert DISPATCHER.parse('address Kyiv') == (address, ['Kyiv'])
+    assert DISPATCHER.parse('addressbook') == (unknown_command, [])
+
+
+def test_punctuation_alias_needs_no_boundary():
+    assert DISPATCHER.parse('?show') == (help_, ['show'])
@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+
+import src.db
+from src.models import Contact, Email, Phone
+from units import contacts_io
+
+
+def make_contacts():
+    return [
+        Contact(name='Ivan Petrenko', birthday=date(1990, 2, 28), address='Kyiv, Khreshchatyk 1',
+                phones=[Phone(phone_number='+380661234567'), Phone(phone_number='+380671234567')],
+                emails=[Email(mail='ivan@example.com')]),
+        Contact(name='Олена', phones=[Phone(phone_number='+380931234567')],
+                emails=[Email(mail='olena@example.com.ua'), Email(mail='o.k@mail.example.org')]),
+        Contact(name='Nobody'),
+    ]
+
+
+def exported(session):
+    contacts = session.query(Contact).order_by(Contact.name)
+    return [contacts_io.contact_record(contact) for contact in contacts]
+
+
+@pytest.mark.parametrize('ext', contacts_io.FORMATS)
+def test_export_then_import_restores_contacts(db_session, tmp_path, monkeypatch, ext):
+    monkeypatch.setattr(contacts_io, 'session', db_session)
+    monkeypatch.setattr(src.db, 'driver', 'sqlite')
+    contacts = make_contacts()
+    db_session.add_all(contacts)
+    db_session.commit()
+    expected = exported(db_session)
+    filename = str(tmp_path / f'contacts.{ext}')
+
+    assert contacts_io.export_contacts(filename) == len(contacts)
+    db_session.query(Contact).delete()
+    db_session.commit()
+    stats = contacts_io.import_contacts(filename)
+
+    assert (stats.records, stats.rejected, stats.phones, stats.emails) == (len(contacts), 0, 0, 0)
+    db_session.expire_all()
+    assert exported(db_session) == expected
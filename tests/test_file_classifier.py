@@ -0,0 +1,35 @@
+import asyncio
+import zipfile
+
+from units import file_parser
+from units.file_classifier import MAGIC, Classifier
+
+
+def make_zip(path, member='mimetype', data='application/epub+zip'):
+    with zipfile.ZipFile(path, 'w') as zip_file:
+        zip_file.writestr(member, data)
+    return path
+
+
+def test_zip_container_with_unknown_extension_is_not_an_archive(tmp_path):
+    classifier = Classifier(file_parser.REGISTER_EXTENSIONS, MAGIC)
+    for name, ext in (('book.epub', 'EPUB'), ('app.jar', 'JAR'), ('report.odt', 'ODT')):
+        assert classifier.classify(str(make_zip(tmp_path / name)), ext) == ('OTHERS', ext)
+
+
+def test_registered_archive_extension_needs_archive_content(tmp_path):
+    classifier = Classifier(file_parser.REGISTER_EXTENSIONS, MAGIC)
+    assert classifier.classify(str(make_zip(tmp_path / 'real.zip')), 'ZIP') == ('ARCHIVES', 'ZIP')
+    fake = tmp_path / 'fake.zip'
+    fake.write_text('not a zip')
+    assert classifier.classify(str(fake), 'ZIP') == ('OTHERS', 'ZIP')
+
+
+def test_file_parser_keeps_epub_and_jar(tmp_path, monkeypatch):
+    make_zip(tmp_path / 'book.epub')
+    make_zip(tmp_path / 'app.jar', 'META-INF/MANIFEST.MF', 'Manifest-Version: 1.0')
+    monkeypatch.setattr(file_parser, 'work_folder', tmp_path)
+    asyncio.run(file_parser.file_parser())
+    assert zipfile.ZipFile(tmp_path / 'OTHERS' / 'EPUB' / 'book.epub').namelist() == ['mimetype']
+    assert zipfile.ZipFile(tmp_path / 'OTHERS' / 'JAR' / 'app.jar').namelist() == ['META-INF/MANIFEST.MF']
+    assert not (tmp_path / 'ARCHIVES').exists()
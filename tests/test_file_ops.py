@@ -0,0 +1,36 @@
+from units.file_ops import TakenNames, free_target
+
+
+def test_free_target_numbers_collisions(tmp_path):
+    target = tmp_path / 'photo.jpg'
+    taken = TakenNames()
+    assert free_target(target, taken) == target
+    assert [free_target(target, taken).name for _ in range(3)] == ['photo_1.jpg', 'photo_2.jpg', 'photo_3.jpg']
+    assert taken.last_number(target) == 3
+
+
+def test_free_target_skips_existing_files(tmp_path):
+    for name in ('doc.txt', 'doc_1.txt', 'doc_3.txt'):
+        (tmp_path / name).write_text(name)
+    taken = TakenNames()
+    target = tmp_path / 'doc.txt'
+    assert [free_target(target, taken).name for _ in range(3)] == ['doc_2.txt', 'doc_4.txt', 'doc_5.txt']
+
+
+def test_forgotten_number_is_found_again(tmp_path):
+    taken = TakenNames(max_numbers=1)
+    first, second = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    for _ in range(3):
+        free_target(first, taken)
+    free_target(second, taken)
+    free_target(second, taken)
+    assert taken.last_number(first) == 0
+    assert free_target(first, taken).name == 'a_3.txt'
+
+
+def test_discarded_name_is_free_again(tmp_path):
+    taken = TakenNames()
+    target = tmp_path / 'song.mp3'
+    assert free_target(target, taken) == target
+    taken.discard(target)
+    assert free_target(target, taken) == target
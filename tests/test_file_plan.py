@@ -0,0 +1,51 @@
+import asyncio
+import os
+
+from units import file_parser
+from units.file_plan import Journal, Step, load_plan, save_plan
+
+
+def test_journal_reloads_flushed_steps_only(tmp_path):
+    filename = tmp_path / 'journal'
+    journal = Journal(filename, batch=2)
+    for index in (0, 1, 2):
+        journal.mark(index)
+    # Збій до наступного пакета: крок 2 у журнал не потрапив
+    journal.file.close()
+    assert Journal(filename).done == {0, 1}
+    # Останній рядок, записаний не повністю, пропускається
+    filename.write_text('0\n1\n2\n\x00')
+    assert Journal(filename).done == {0, 1, 2}
+
+
+def test_file_parser_resumes_plan_after_partial_apply(tmp_path, monkeypatch):
+    service = tmp_path / file_parser.SERVICE_FOLDER
+    service.mkdir()
+    (tmp_path / 'old').mkdir()
+    for name in ('a.jpg', 'b.mp3', 'c.txt'):
+        (tmp_path / 'old' / name).write_text(name)
+    plan = [Step('move', str(tmp_path / 'old' / 'a.jpg'), str(tmp_path / 'IMAGES' / 'JPG' / 'a.jpg')),
+            Step('move', str(tmp_path / 'old' / 'b.mp3'), str(tmp_path / 'AUDIO' / 'MP3' / 'b.mp3')),
+            Step('move', str(tmp_path / 'old' / 'c.txt'), str(tmp_path / 'DOCUMENTS' / 'TXT' / 'c.txt')),
+            Step('rmdir', str(tmp_path / 'old'))]
+    save_plan(plan, service / file_parser.PLAN)
+    assert load_plan(service / file_parser.PLAN) == plan
+    # Крок 0 виконано й записано в журнал, крок 1 виконано, але до журналу не дійшов
+    for step in plan[:2]:
+        os.makedirs(os.path.dirname(step.destination))
+        os.replace(step.source, step.destination)
+    journal = Journal(service / file_parser.JOURNAL, batch=1)
+    journal.mark(0)
+    journal.close()
+    # Файл, що з'явився після планування, не входить у план і лишається на місці
+    (tmp_path / 'new.txt').write_text('new')
+
+    monkeypatch.setattr(file_parser, 'work_folder', tmp_path)
+    result = asyncio.run(file_parser.file_parser())
+
+    assert '2 files' in result
+    for step in plan[:3]:
+        assert open(step.destination).read() == os.path.basename(step.destination)
+    assert sorted(os.listdir(tmp_path)) == sorted(['.file_parser', 'AUDIO', 'DOCUMENTS', 'IMAGES', 'new.txt'])
+    assert sorted(os.listdir(tmp_path / 'AUDIO' / 'MP3')) == ['b.mp3']
+    assert not (service / file_parser.PLAN).exists() and not (service / file_parser.JOURNAL).exists()
@@ -0,0 +1,53 @@
+from src.models import Contact, Note
+from units.paginator import PAGINATOR_NUMBER, QueryPaginator, hyphenation_string, strip_ansi, visible_width
+
+
+def names(records):
+    return [record.name for record in records]
+
+
+def test_query_paginator_next_and_previous_pages(db_session):
+    all_names = [f'name {number}' for number in range(2 * PAGINATOR_NUMBER + 1)]
+    db_session.add_all(Contact(name=name) for name in reversed(all_names))
+    db_session.commit()
+    paginator = QueryPaginator(db_session.query(Contact), Contact.name)
+    pages = [all_names[start:start + PAGINATOR_NUMBER] for start in range(0, len(all_names), PAGINATOR_NUMBER)]
+    for number, expected in enumerate(pages):
+        records, has_next = paginator.get_page(number)
+        assert (names(records), has_next) == (expected, number < len(pages) - 1)
+    records, has_next = paginator.get_page(1)
+    assert (names(records), has_next) == (pages[1], True)
+    records, has_next = paginator.get_page(0)
+    assert (names(records), has_next) == (pages[0], True)
+    assert names(paginator.records()) == all_names
+
+
+def test_query_paginator_with_composite_key(db_session):
+    db_session.add_all(Note(text=text) for text in ['b', 'a', 'b', 'a', 'c'])
+    db_session.commit()
+    paginator = QueryPaginator(db_session.query(Note), Note.text, Note.id)
+    first, has_next = paginator.get_page(0)
+    assert has_next
+    second, has_next = paginator.get_page(1)
+    assert not has_next
+    assert [(note.text, note.id) for note in first + second] == [('a', 2), ('a', 4), ('b', 1), ('b', 3), ('c', 5)]
+
+
+def test_hyphenation_string_ascii():
+    assert hyphenation_string('aaa bbb ccc ddd', 7) == 'aaa bbb\nccc ddd'
+    assert hyphenation_string('  one   two  ', 80) == 'one two'
+
+
+def test_hyphenation_string_counts_wide_characters_twice():
+    text = '日本語 テスト ok'
+    assert visible_width('日本語') == 6
+    assert hyphenation_string(text, 13) == '日本語 テスト\nok'
+    assert hyphenation_string(text, 16) == text
+
+
+def test_hyphenation_string_ignores_ansi_colours():
+    red, reset = '\033[31m', '\033[0m'
+    text = f'{red}alpha{reset} {red}beta{reset} gamma'
+    lines = hyphenation_string(text, 10).split('\n')
+    assert [strip_ansi(line) for line in lines] == ['alpha beta', 'gamma']
+    assert lines[0] == f'{red}alpha{reset} {red}beta{reset}'
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.db import UnitOfWork
+from src.models import Note, Tag
+
+
+def add_note(unit, text):
+    with unit.command() as session:
+        session.add(Note(text=text))
+
+
+def test_failed_command_rolls_back_to_its_savepoint(db_session):
+    unit = UnitOfWork(db_session)
+    unit.start_batch(10)
+    add_note(unit, 'first')
+    with pytest.raises(IntegrityError) as error:
+        with unit.command() as session:
+            note = db_session.query(Note).one()
+            session.add_all([Tag(tag='dup', note_id=note.id), Tag(tag='dup', note_id=note.id)])
+    assert not unit.is_lost(error.value)
+    add_note(unit, 'second')
+    assert unit.pending == 2
+    assert unit.stop_batch() == 2
+    assert [note.text for note in db_session.query(Note).order_by(Note.id)] == ['first', 'second']
+    assert db_session.query(Tag).count() == 0
+
+
+def test_batch_commits_every_batch_size_commands(db_session):
+    unit = UnitOfWork(db_session)
+    unit.start_batch(3)
+    for number in range(4):
+        add_note(unit, f'note {number}')
+    assert unit.pending == 1
+    unit.rollback()
+    assert db_session.query(Note).count() == 3
+
+
+def test_expired_batch_is_committed(db_session, monkeypatch):
+    unit = UnitOfWork(db_session)
+    unit.start_batch(100, timeout=5)
+    add_note(unit, 'note')
+    assert unit.commit_expired() == 0
+    monkeypatch.setattr('src.db.time', lambda: unit.started + 5)
+    assert unit.expires_in() == 0
+    assert unit.commit_expired() == 1
+    assert unit.pending == 0
@@ -1,18 +1,18 @@
 import datetime
 import re
 
-from prompt_toolkit import prompt
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.completion import NestedCompleter
-from prompt_toolkit.history import FileHistory
 
-from units.command_parser import command_parser, RainbowLexer
-from units.paginator import Paginator, hyphenation_string
+from units.command_parser import CommandDispatcher, confirm, prompt_session
+from units.paginator import QueryPaginator, Listing, print_result, hyphenation_string
+from units.transaction import TRANSACTION_COMMANDS, TRANSACTION_HELP, leave_module, prompt_command
 
-from src.db import session
+from src.db import session, session_scope, unit_of_work
 from src.models import Contact, Phone, Email
+from src.search import search_contacts
 from sqlalchemy.exc import NoResultFound, IntegrityError
-from sqlalchemy import and_, not_, or_
+from sqlalchemy import and_
+from sqlalchemy.orm import selectinload
 
 
 class PhoneUserAlreadyExists(Exception):
@@ -41,7 +41,9 @@ class InputError:
 
     def __call__(self, contacts, *args):
         try:
-            return self.func(contacts, *args)
+            # Зміни фіксуються (або відкочуються при помилці) після команди, див. UnitOfWork
+            with unit_of_work.command():
+                return self.func(contacts, *args)
         except IndexError:
             return 'Error! Give me name and phone or birthday please!'
         except KeyError:
@@ -61,7 +63,6 @@ class InputError:
         except NoResultFound:
             return 'Error! Input data are not exist!'
         except IntegrityError:
-            session.close()
             return 'Error! Output data are now exist!'
 
 
@@ -90,15 +91,18 @@ def is_valid_email(mail_):
     return get_emails
 
 
+def contacts_query():
+    # Контакти разом з телефонами та поштою: два додаткових запити на всю вибірку, а не на кожен контакт
+    return session.query(Contact).options(selectinload(Contact.phones), selectinload(Contact.emails))
+
+
 def view_contact(contact):
-    id_ = contact.id
     name_ = contact.name
     birthday_ = datetime.date.strftime(contact.birthday, '%d %b %Y') if contact.birthday else '     -    '
     address_ = contact.address
-    phone_db = session.query(Phone).filter(Phone.contact_id == id_).order_by(Phone.phone_number).all()
-    email_db = session.query(Email).filter(Email.contact_id == id_).order_by(Email.mail).all()
-    phones_str = ', '.join([ph.phone_number for ph in phone_db])
-    emails_str = ', '.join([em.mail for em in email_db])
+    # Телефони та пошта вже завантажені разом з контактом (див. contacts_query)
+    phones_str = ', '.join([ph.phone_number for ph in contact.phones])
+    emails_str = ', '.join([em.mail for em in contact.emails])
     return f'\033[34mContact\033[0m \033[35m{name_:50}\033[0m \033[34mBirthday:\033[0m {birthday_}\n' + \
         hyphenation_string(f'\033[34mPhones:\033[0m {phones_str}') + '\n' + \
         hyphenation_string(f'\033[34mEmail:\033[0m {emails_str}') + '\n' + \
@@ -108,31 +112,23 @@ def view_contact(contact):
 @InputError
 def add_contact(*args):
     add_name = args[0]
+    contact = session.query(Contact).filter(Contact.name == add_name).one_or_none()
     if len(args) == 1:
-        try:
-            session.query(Contact).filter(Contact.name == add_name).one()
+        if contact is not None:
             return f'Contact {add_name} now exist!'
-        except NoResultFound:
-            new_contact = Contact(name=add_name)
-            session.add(new_contact)
-            session.commit()
-            return f'Add contact {add_name} without phones'
+        session.add(Contact(name=add_name))
+        return f'Add contact {add_name} without phones'
 
     add_phone = phone_normalizer(args[1])
-    try:
-        session.query(Phone).filter(Phone.phone_number == add_phone).one()
+    if add_phone is None:
+        raise ValueError
+    if session.query(Phone.id).filter(Phone.phone_number == add_phone).first() is not None:
         return f'Phone {add_phone} now exist'
-    except NoResultFound:
-        try:
-            contact = session.query(Contact).filter(Contact.name == add_name).one()
-        except NoResultFound:
-            new_contact = Contact(name=add_name)
-            session.add(new_contact)
-            session.commit()
-            contact = session.query(Contact).filter(Contact.name == add_name).one()
-        phone = Phone(phone_number=add_phone, contact_id=contact.id)
-        session.add(phone)
-        session.commit()
+    if contact is None:
+        contact = Contact(name=add_name)
+        session.add(contact)
+        session.flush()  # INSERT повертає id нового контакту без додаткового запиту
+    session.add(Phone(phone_number=add_phone, contact_id=contact.id))
     return f'Add contact {add_name} with phone number {add_phone}'
 
 
@@ -150,14 +146,13 @@ def change_contact(*args):
     contact = session.query(Contact).filter(Contact.name == name_).one()
     phone = session.query(Phone).filter(and_(Phone.phone_number == old_phone, Phone.contact_id == contact.id)).one()
     phone.phone_number = new_phone
-    session.commit()
     return f'Change to contact {name_} phone number from {old_phone} to {new_phone}'
 
 
 @InputError
 def show_phone(*args):
     name_ = args[0]
-    contact = session.query(Contact).filter(Contact.name == name_).one()
+    contact = contacts_query().filter(Contact.name == name_).one()
     return view_contact(contact)
 
 
@@ -169,20 +164,12 @@ def del_phone(*args):
     contact = session.query(Contact).filter(Contact.name == name_).one()
     phone = session.query(Phone).filter(and_(Phone.contact_id == contact.id, Phone.phone_number == phone_)).one()
     session.delete(phone)
-    session.commit()
     return f'Delete phone {phone_} from contact {name_}'
 
 
 def show_all(*args):
-    contacts = session.query(Contact).order_by(Contact.name).all()
-    result = 'List of all users:\n'
-    print_list = Paginator(contacts).get_view(func=view_contact)
-    for item in print_list:
-        if item is None:
-            return 'No contacts found'
-        else:
-            result += f'{item}'
-    return result
+    pages = QueryPaginator(contacts_query(), Contact.name)
+    return Listing('List of all users:', pages, view_contact, 'No contacts found')
 
 
 @InputError
@@ -197,7 +184,6 @@ def add_birthday(*args):
         except ValueError:
             raise DateIsNotValid
     contact.birthday = birthday_
-    session.commit()
     return f'Birthday {birthday_} added/modify to contact {name_}'
 
 
@@ -213,15 +199,9 @@ def days_to_user_birthday(*args):
 @InputError
 def show_birthday(*args):
     days = int(args[0])
-    contacts = session.query(Contact).filter(Contact.birthday != None).order_by(Contact.name).all()
-    result = 'List of all users:\n'
-    print_list = Paginator([c for c in contacts if c.days_to_birthday <= days]).get_view(func=view_contact)
-    for item in print_list:
-        if item is None:
-            return 'No contacts found'
-        else:
-            result += f'{item}'
-    return result
+    contacts = contacts_query().filter(Contact.birthday_within(days))
+    pages = QueryPaginator(contacts, Contact.name)
+    return Listing('List of all users:', pages, view_contact, 'No contacts found')
 
 
 def goodbye(*args):
@@ -232,17 +212,11 @@ def goodbye(*args):
 def search(*args):
     if len(args) == 1:
         substr = args[0]
-        contacts = session.query(Contact).outerjoin(Phone).outerjoin(Email).filter(or_(Contact.name.ilike(f'%{substr}%'),
-                Phone.phone_number.ilike(f'%{substr}%'), Email.mail.ilike(f'%{substr}%'))).order_by(Contact.name).all()
-
-        result = f'List of users with \'{substr.lower()}\' in data:\n'
-        print_list = Paginator(contacts).get_view(func=view_contact)
-        for item in print_list:
-            if item is None:
-                return f'Users with \'{substr.lower()}\' in data not found'
-            else:
-                result += f'{item}'
-        return result
+        # Найрелевантніші контакти першими, далі за іменем
+        contacts, rank = search_contacts(contacts_query(), substr)
+        pages = QueryPaginator(contacts, rank, Contact.name)
+        return Listing(f'List of users with \'{substr.lower()}\' in data:', pages, view_contact,
+                       f'Users with \'{substr.lower()}\' in data not found')
     else:
         raise FindNotFound
 
@@ -251,10 +225,8 @@ def search(*args):
 def del_user(*args):
     name_ = args[0]
     session.query(Contact).filter(Contact.name == name_).one()
-    yes_no = input(f'Are you sure you want to delete the user {name_}? (Y/n) ')
-    if yes_no == 'Y':
+    if confirm(f'Are you sure you want to delete the user {name_}?'):
         session.query(Contact).filter(Contact.name == name_).delete()
-        session.commit()
         return f'Delete contact {name_}'
     else:
         return 'Contact not deleted'
@@ -268,14 +240,13 @@ def add_email(*args):
     # Додавання нових адрес
     result_emails = []
     for email_ in emails_:
-        new_email = Email(contact_id=contact.id, mail=email_)
         try:
-            session.add(new_email)
-            session.commit()
+            # Окремий SAVEPOINT: існуюча адреса не скасовує додавання інших
+            with session.begin_nested():
+                session.add(Email(contact_id=contact.id, mail=email_))
             result_emails.append(email_)
-        except:
+        except IntegrityError:
             print(f'{email_} exist')
-            session.close()
     if result_emails:
         return f'Email(s) {", ".join(result_emails)} add to contact {name_}'
     else:
@@ -288,7 +259,6 @@ def del_email(*args):
     contact = session.query(Contact).filter(Contact.name == name_).one()
     email_del = session.query(Email).filter(and_(Email.contact_id == contact.id, Email.mail == email_)).one()
     session.delete(email_del)
-    session.commit()
     return f'Delete email {email_} from contact {name_}'
 
 
@@ -297,10 +267,35 @@ def add_address(*args):
     name_, address_ = args[0], " ".join(args[1:])
     contact = session.query(Contact).filter(Contact.name == name_).one()
     contact.address = address_.strip()
-    session.commit()
     return f'Add/modify address {address_} to contact {name_}'
 
 
+def import_file(*args):
+    # Модуль імпорту сам використовує phone_normalizer та is_valid_email цього модуля
+    from units.contacts_io import import_contacts
+    filename = ' '.join(args)
+    if not filename:
+        return 'Error! Give me file name please!'
+    # Імпорт фіксує кожен пакет сам, тому спершу фіксуємо незавершений пакет команд
+    unit_of_work.commit()
+    try:
+        return f'Imported {import_contacts(filename)}'
+    except (OSError, ValueError) as error:
+        return f'Error! {error}'
+
+
+def export_file(*args):
+    from units.contacts_io import export_contacts
+    filename = ' '.join(args)
+    if not filename:
+        return 'Error! Give me file name please!'
+    unit_of_work.commit()
+    try:
+        return f'Exported {export_contacts(filename)} contacts to {filename}'
+    except (OSError, ValueError) as error:
+        return f'Error! {error}'
+
+
 def help_me(*args):
     return """\nCommand format:
     help or ? - this help;
@@ -318,42 +313,40 @@ def help_me(*args):
     find or search <sub> - show data of all contacts with sub in name, phones or emails;
     days to birthday <name> - show how many days to the contact's birthday;
     show birthday days <N> - show the contact's birthday in the next N days;
-    good bye or close or exit or . - exit the program"""
+    import <file> - import contacts from .csv, .json or .vcf file;
+    export <file> - export all contacts to .csv, .json or .vcf file;
+    good bye or close or exit or . - exit the program""" + TRANSACTION_HELP
 
 
 COMMANDS_A = {salute: ['hello'], add_contact: ['add '], change_contact: ['change '], help_me: ['?', 'help'],
               show_all: {'show all'}, goodbye: ['good bye', 'close', 'exit', '.'], del_phone: ['del phone '],
               add_birthday: ['birthday'], days_to_user_birthday: ['days to birthday '],
               show_birthday: ['show birthday days '], show_phone: ['show '], search: ['find ', 'search '],
-              del_user: ['delete '], add_email: ['email '], add_address: ['address'], del_email: ['del email']}
+              del_user: ['delete '], add_email: ['email '], add_address: ['address'], del_email: ['del email'],
+              import_file: ['import '], export_file: ['export '], **TRANSACTION_COMMANDS}
+
+
+DISPATCHER_A = CommandDispatcher(COMMANDS_A)
 
 
 def start_ab():
     print('\n\033[033mWelcome to the address book!\033[0m')
     print(f"\033[032mType command or '?' for help \033[0m\n")
-    while True:
-        with open("history.txt", "wb"):
-            pass
-        # user_command = input('Enter command >>> ')
-        user_command = prompt('Enter command >>> ',
-                              history=FileHistory('history.txt'),
-                              auto_suggest=AutoSuggestFromHistory(),
-                              completer=Completer,
-                              lexer=RainbowLexer()
-                              )
-        command, data = command_parser(user_command, COMMANDS_A)
-        print(command(*data), '\n')
-        if command is goodbye:
-            break
-
-
-Completer = NestedCompleter.from_nested_dict({'help': None, 'hello': None, 'good bye': None, 'exit': None,
-                                              'close': None, '?': None, '.': None, 'birthday': None,
-                                              'days to birthday': None, 'add': None,
-                                              'show': {'all': None, 'birthday days': None},
-                                              'change': None, 'del': {'phone': None, 'email': None}, 'delete': None,
-                                              'clear': None, 'email': None, 'find': None, 'search': None,
-                                              'address': None})
+    session_prompt = prompt_session('addressbook', Completer)
+    try:
+        while True:
+            user_command = prompt_command(session_prompt, 'Enter command >>> ')
+            with session_scope():
+                command, data = DISPATCHER_A.parse(user_command)
+                print_result(command(*data), release=unit_of_work.release)
+            if command is goodbye:
+                break
+    finally:
+        # Також при Ctrl+C / Ctrl+D: незафіксовані команди пакета не губляться
+        leave_module()
+
+
+Completer = NestedCompleter.from_nested_dict(DISPATCHER_A.completions())
 
 if __name__ == "__main__":
     start_ab()
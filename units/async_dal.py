@@ -0,0 +1,124 @@
+"""Асинхронний доступ до адресної книги та нотатника.
+
+Ті самі операції, що й команди units/adressbook.py та units/notebook.py, але без блокування: кожна операція
+бере з пулу власну AsyncSession, тож незалежні запити (телефони й пошта контакту, багато команд скрипта)
+виконуються одночасно.
+
+    results = asyncio.run(run_many([add_contact('Ann', '0671234567'), add_note('Buy milk')], concurrency=5))
+"""
+import asyncio
+import re
+
+from sqlalchemy import select, not_
+from sqlalchemy.orm import selectinload
+
+from src.async_db import async_engine, async_session_scope
+from src.db import dialect_insert, pool_size
+from src.models import Contact, Phone, Email, Note, Tag
+from src.search import search_contacts as contacts_filter, search_notes as notes_filter
+from units.adressbook import phone_normalizer, is_valid_email
+
+SEARCH_LIMIT = 100
+
+
+async def add_contact(name: str, phone: str = None) -> Contact:
+    """Додає контакт (якщо його ще немає) і, якщо вказано, телефон до нього"""
+    phone_number = None
+    if phone is not None:
+        phone_number = phone_normalizer(phone)
+        if phone_number is None:
+            raise ValueError(f'Phone number {phone} is incorrect')
+    async with async_session_scope() as session:
+        contact = (await session.execute(select(Contact).where(Contact.name == name))).scalar_one_or_none()
+        if contact is None:
+            contact = Contact(name=name)
+            session.add(contact)
+            await session.flush()
+        if phone_number is not None:
+            session.add(Phone(phone_number=phone_number, contact_id=contact.id))
+    return contact
+
+
+async def change_phone(name: str, old_phone: str, new_phone: str) -> Phone:
+    old_number, new_number = phone_normalizer(old_phone), phone_normalizer(new_phone)
+    if old_number is None or new_number is None:
+        raise ValueError('Phone number is incorrect')
+    async with async_session_scope() as session:
+        phone = (await session.execute(select(Phone).join(Phone.contact).where(
+            Contact.name == name, Phone.phone_number == old_number))).scalar_one()
+        phone.phone_number = new_number
+    return phone
+
+
+async def add_email(name: str, mail: str) -> list:
+    emails = is_valid_email(mail)
+    async with async_session_scope() as session:
+        contact_id = (await session.execute(select(Contact.id).where(Contact.name == name))).scalar_one()
+        await session.execute(dialect_insert(Email).on_conflict_do_nothing(index_elements=['mail']),
+                              [{'contact_id': contact_id, 'mail': email} for email in emails])
+    return emails
+
+
+async def contact_phones(contact_id: int) -> list:
+    async with async_session_scope() as session:
+        result = await session.execute(select(Phone.phone_number).where(Phone.contact_id == contact_id)
+                                       .order_by(Phone.phone_number))
+        return result.scalars().all()
+
+
+async def contact_emails(contact_id: int) -> list:
+    async with async_session_scope() as session:
+        result = await session.execute(select(Email.mail).where(Email.contact_id == contact_id).order_by(Email.mail))
+        return result.scalars().all()
+
+
+async def get_contact(name: str) -> dict:
+    """Дані контакту; телефони та пошта запитуються одночасно по двох з'єднаннях"""
+    async with async_session_scope() as session:
+        contact = (await session.execute(select(Contact).where(Contact.name == name))).scalar_one()
+    phones, emails = await asyncio.gather(contact_phones(contact.id), contact_emails(contact.id))
+    return {'name': contact.name, 'birthday': contact.birthday, 'address': contact.address, 'phones': phones,
+            'emails': emails}
+
+
+async def search_contacts(text: str, limit: int = SEARCH_LIMIT) -> list:
+    query, rank = contacts_filter(select(Contact).options(selectinload(Contact.phones),
+                                                          selectinload(Contact.emails)),
+                                  text, async_engine.dialect.name)
+    async with async_session_scope() as session:
+        result = await session.execute(query.order_by(rank, Contact.name).limit(limit))
+        return result.scalars().all()
+
+
+async def add_note(text: str, tags=()) -> Note:
+    async with async_session_scope() as session:
+        note = Note(text=text)
+        session.add(note)
+        await session.flush()
+        tags = set(re.sub(r'[;,.!?]', ' ', ' '.join(tags)).title().split())
+        if tags:
+            await session.execute(dialect_insert(Tag).on_conflict_do_nothing(index_elements=['note_id', 'tag']),
+                                  [{'note_id': note.id, 'tag': tag} for tag in tags])
+    return note
+
+
+async def find_notes(text: str, limit: int = SEARCH_LIMIT) -> list:
+    query, rank = notes_filter(select(Note).options(selectinload(Note.tags)).where(not_(Note.is_done)), text,
+                               async_engine.dialect.name)
+    async with async_session_scope() as session:
+        result = await session.execute(query.order_by(rank, Note.id).limit(limit))
+        return result.scalars().all()
+
+
+async def run_many(operations, concurrency: int = pool_size) -> list:
+    """Виконує операції (корутини) одночасно, не більше concurrency за раз - по одній на з'єднання пулу.
+
+    Повертає результати в порядку операцій; помилка операції повертається як виняток, а не перериває інші.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(operation):
+        async with semaphore:
+            return await operation
+
+    return await asyncio.gather(*(limited(operation) for operation in operations), return_exceptions=True)
@@ -0,0 +1,104 @@
+"""Пакетний (неінтерактивний) режим: команди адресної книги та нотатника з файлу або stdin.
+
+Кожен рядок файлу - команда у тому ж форматі, що й у діалозі; рядки 'addressbook' та 'notebook' перемикають
+модуль (за замовчуванням адресна книга), порожні рядки та рядки з '#' пропускаються. Результат кожної
+команди - рядок JSON у stdout:
+
+    {"line": 3, "module": "addressbook", "command": "add Ann 0671234567", "ok": true, "result": "..."}
+
+Команди виконуються у спільній транзакції з фіксацією кожні commit_every команд (див. UnitOfWork).
+
+    python main.py --batch commands.txt --yes
+    cat commands.txt | python main.py --batch
+"""
+import io
+import json
+import sys
+from contextlib import redirect_stdout
+from time import time
+
+from sqlalchemy.exc import DBAPIError
+
+from src.db import session, unit_of_work
+from units import command_parser
+from units.adressbook import DISPATCHER_A
+from units.command_parser import unknown_command
+from units.notebook import DISPATCHER
+from units.paginator import Listing, strip_ansi
+
+MODULES = {'addressbook': DISPATCHER_A, 'notebook': DISPATCHER}
+COMMIT_EVERY = 1000
+
+
+def listing_records(listing: Listing) -> list:
+    """Усі записи Listing (без навігації), як текст без кольорів"""
+    return [strip_ansi(listing.func(record)) for record in listing.paginator.records()]
+
+
+def run_command(handler, args) -> dict:
+    # Команди, що самі щось друкують (import, email), не повинні ламати формат виводу
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result = handler(*args)
+        if isinstance(result, Listing):
+            records = listing_records(result)
+            result = {'title': result.title, 'records': records} if records else result.empty
+    row = {'ok': handler is not unknown_command and not (isinstance(result, str) and result.startswith('Error!')),
+           'result': strip_ansi(result) if isinstance(result, str) else result}
+    if output.getvalue():
+        row['output'] = strip_ansi(output.getvalue())
+    return row
+
+
+def run_batch(lines, out=sys.stdout, assume_yes: bool = False, commit_every: int = COMMIT_EVERY) -> dict:
+    """Виконує команди з lines, пише результати рядками JSON в out, повертає підсумок"""
+    command_parser.confirm_answer = assume_yes
+    module = 'addressbook'
+    summary = {'commands': 0, 'errors': 0, 'discarded': 0}
+    start = time()
+    unit_of_work.start_batch(commit_every)
+    try:
+        for number, line in enumerate(lines, 1):
+            user_command = line.strip()
+            if not user_command or user_command.startswith('#'):
+                continue
+            if user_command.lower() in MODULES:
+                module = user_command.lower()
+                continue
+            handler, args = MODULES[module].parse(user_command)
+            try:
+                row = run_command(handler, args)
+            except DBAPIError as error:
+                row = {'ok': False, 'result': f'Error! Database error: {error.orig}'}
+                # Помилку команди вже відкочено до її SAVEPOINT; лише якщо транзакція втрачена,
+                # відкочуємо її разом з усіма незафіксованими командами пакета
+                if unit_of_work.is_lost(error):
+                    row['discarded'] = unit_of_work.pending
+                    summary['discarded'] += unit_of_work.pending
+                    try:
+                        unit_of_work.rollback()
+                    except DBAPIError:
+                        pass
+                    session.remove()
+            summary['commands'] += 1
+            summary['errors'] += not row['ok']
+            out.write(json.dumps({'line': number, 'module': module, 'command': user_command, **row},
+                                 ensure_ascii=False, default=str) + '\n')
+        unit_of_work.stop_batch()
+    finally:
+        if unit_of_work.active:
+            summary['discarded'] += unit_of_work.rollback()
+            unit_of_work.stop_batch()
+        session.remove()
+        command_parser.confirm_answer = None
+    seconds = time() - start
+    summary.update(seconds=round(seconds, 3), commands_per_second=round(summary['commands'] / max(seconds, 1e-6)))
+    return summary
+
+
+def start_batch(filename: str, assume_yes: bool = False, commit_every: int = COMMIT_EVERY) -> dict:
+    """Пакетний режим для main.py: filename '-' - читати команди з stdin"""
+    if filename == '-':
+        return run_batch(sys.stdin, assume_yes=assume_yes, commit_every=commit_every)
+    with open(filename, encoding='utf-8') as file:
+        return run_batch(file, assume_yes=assume_yes, commit_every=commit_every)
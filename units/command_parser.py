@@ -1,19 +1,87 @@
+import os
+from itertools import islice
+
+from prompt_toolkit import PromptSession
+from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+from prompt_toolkit.history import FileHistory
 from prompt_toolkit.lexers import Lexer
 from prompt_toolkit.styles.named_colors import NAMED_COLORS
 
+HISTORY_SIZE = 1000  # останніх команд в пам'яті для стрілок та підказок AutoSuggestFromHistory
+SAVE_HISTORY = True  # дописувати команди у файл history_<модуль>.txt, щоб історія була доступна в наступних сеансах
+HISTORY_BLOCK = 1 << 16  # байтів файлу історії, що читаються за раз (з кінця файлу)
+
+
+# Відповідь на запити підтвердження без діалогу (пакетний режим, --yes); None - питати користувача
+confirm_answer = None
+
 
 def unknown_command(*args):
     return 'Unknown command! Enter again!'
 
 
-def command_parser(user_command: str, COMMANDS: dict) -> (str, list):
-    for key, list_value in COMMANDS.items():
-        for value in list_value:
-            if user_command.lower().startswith(value):
-                args = user_command[len(value):].split()
-                return key, args
-    else:
-        return unknown_command, []
+def confirm(question: str) -> bool:
+    if confirm_answer is not None:
+        return confirm_answer
+    return input(f'{question} (Y/n) ') == 'Y'
+
+
+class CommandDispatcher:
+    """Розбір команд за префіксним деревом (trie) псевдонімів.
+
+    Обирається найдовший псевдонім, після якого у введенні йде пробіл або кінець рядка (для псевдонімів на
+    кшталт '?' чи '.' межа слова не потрібна), тому результат не залежить від порядку команд у словнику:
+    'show all' не перехоплюється 'show ', а 'addressbook' не є командою 'address'.
+    Розбір однієї команди - один прохід по введеному рядку, незалежно від кількості команд.
+    """
+    HANDLER = object()  # ключ вузла дерева, під яким зберігається обробник
+
+    def __init__(self, commands: dict):
+        self.root = {}
+        self.aliases = []
+        for handler, aliases in commands.items():
+            for alias in aliases:
+                alias = ' '.join(alias.lower().split())
+                node = self.root
+                for char in alias:
+                    node = node.setdefault(char, {})
+                node[self.HANDLER] = handler
+                self.aliases.append(alias)
+
+    def parse(self, user_command: str) -> (str, list):
+        text = user_command.lstrip()
+        lower_text = text.lower()
+        node, handler, length = self.root, unknown_command, None
+        previous = ''
+        for index, char in enumerate(lower_text):
+            if char.isspace():
+                if previous.isspace():
+                    continue  # кілька пробілів поспіль - як один, так само як у псевдонімах
+                char = ' '
+            previous = char
+            node = node.get(char)
+            if node is None:
+                break
+            if self.HANDLER in node:
+                next_char = lower_text[index + 1:index + 2]
+                if not next_char or next_char.isspace() or not char.isalnum():
+                    handler, length = node[self.HANDLER], index + 1
+        if length is None:
+            return unknown_command, []
+        return handler, text[length:].split()
+
+    def completions(self) -> dict:
+        """Вкладений словник для NestedCompleter.from_nested_dict з тих самих псевдонімів"""
+        tree = {}
+        for alias in self.aliases:
+            words = alias.split()
+            node = tree
+            for word in words[:-1]:
+                if not isinstance(node.get(word), dict):
+                    node[word] = {}
+                node = node[word]
+            node.setdefault(words[-1], None)
+        return tree
 
 
 class RainbowLexer(Lexer):
@@ -29,3 +97,61 @@ class RainbowLexer(Lexer):
         return get_line
 
 
+class BoundedHistory(FileHistory):
+    """Історія команд: в пам'яті не більше max_size останніх команд, у файл нові команди лише дописуються.
+
+    З файлу читається лише його кінець з max_size останніми командами, тож запуск не сповільнюється
+    з ростом файлу. Без filename історія живе лише в пам'яті сеансу.
+    """
+
+    def __init__(self, filename=None, max_size: int = HISTORY_SIZE):
+        self.max_size = max_size
+        super().__init__(filename)
+
+    def load_history_strings(self):
+        if self.filename is None or not os.path.exists(self.filename):
+            return []
+        # Формат FileHistory: кожна команда - рядок "# час" і рядки команди з префіксом +
+        blocks, headers = [], 0
+        with open(self.filename, 'rb') as file:
+            position = file.seek(0, os.SEEK_END)
+            while position > 0 and headers <= self.max_size:
+                size = min(HISTORY_BLOCK, position)
+                position -= size
+                file.seek(position)
+                blocks.append(file.read(size))
+                headers += blocks[-1].count(b'\n#')
+        data = b''.join(reversed(blocks))
+        if position > 0:
+            # Початок прочитаного - посередині старішої команди, яка вже не потрібна
+            data = data[data.index(b'\n#') + 1:]
+        strings, lines = [], []
+        for line in data.decode('utf-8', errors='replace').split('\n'):
+            if line.startswith('+'):
+                lines.append(line[1:])
+            elif lines:
+                strings.append('\n'.join(lines))
+                lines = []
+        if lines:
+            strings.append('\n'.join(lines))
+        return islice(reversed(strings), self.max_size)
+
+    def store_string(self, string: str):
+        if self.filename is not None:
+            super().store_string(string)
+
+    def append_string(self, string: str):
+        super().append_string(string)
+        del self._loaded_strings[self.max_size:]
+
+
+prompt_sessions = {}
+
+
+def prompt_session(name: str, completer) -> PromptSession:
+    """Сесія введення команд модуля name; створюється один раз і зберігає історію між входами в модуль"""
+    if name not in prompt_sessions:
+        history = BoundedHistory(f'history_{name}.txt' if SAVE_HISTORY else None)
+        prompt_sessions[name] = PromptSession(history=history, auto_suggest=AutoSuggestFromHistory(),
+                                              completer=completer, lexer=RainbowLexer())
+    return prompt_sessions[name]
@@ -0,0 +1,304 @@
+"""Імпорт та експорт контактів у CSV, JSON та vCard.
+
+Файли читаються і пишуться потоково, контакти вставляються пакетами по CHUNK_SIZE записів
+(INSERT ... ON CONFLICT через executemany), тому пам'ять не залежить від розміру файлу.
+
+    python -m units.contacts_io import contacts.csv
+    python -m units.contacts_io export contacts.vcf
+"""
+import argparse
+import csv
+import datetime
+import json
+from pathlib import Path
+from time import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from src.db import session, dialect_insert
+from src.models import Contact, Phone, Email, birthday_key
+from units.adressbook import phone_normalizer, is_valid_email
+
+CHUNK_SIZE = 1000
+FORMATS = ('csv', 'json', 'vcf')
+CSV_FIELDS = ('name', 'phones', 'emails', 'birthday', 'address')
+
+
+class ImportStats:
+    def __init__(self):
+        self.start = time()
+        self.records = 0
+        self.rejected = 0
+        self.phones = 0
+        self.emails = 0
+
+    def __str__(self):
+        seconds = time() - self.start
+        return f'{self.records} records ({self.rejected} rejected, {self.phones} invalid phones, ' \
+               f'{self.emails} invalid emails) in {seconds:.1f} s, {self.records / max(seconds, 1e-6):.0f} records/s'
+
+
+def file_format(filename: str) -> str:
+    ext = Path(filename).suffix[1:].lower()
+    if ext == 'vcard':
+        ext = 'vcf'
+    if ext not in FORMATS:
+        raise ValueError(f'Unknown file format {ext}, expected one of {", ".join(FORMATS)}')
+    return ext
+
+
+def parse_birthday(value: str):
+    for date_format in ('%Y-%m-%d', '%d.%m.%Y', '%Y%m%d'):
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    return None
+
+
+def split_values(value) -> list:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.replace(',', ';').split(';') if item.strip()]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+# --- читання ---------------------------------------------------------------------------------------------------------
+
+def read_csv(file):
+    # Телефони та адреси пошти в одній клітинці розділяються ';'
+    for row in csv.DictReader(file):
+        yield row
+
+
+def read_json(file, buffer_size=1 << 16):
+    """Потоково читає JSON-масив об'єктів, не завантажуючи весь файл"""
+    decoder = json.JSONDecoder()
+    buffer, started = '', False
+    while True:
+        chunk = file.read(buffer_size)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('JSON file must contain an array of contacts')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield record
+        buffer = buffer[position:]
+        if not chunk:
+            return
+
+
+def vcard_unescape(value: str) -> str:
+    return value.replace('\\n', ' ').replace('\\N', ' ').replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+
+
+def read_vcard_lines(file):
+    # Розгортаємо перенесені рядки vCard (продовження починається з пробілу або табуляції)
+    line = None
+    for raw in file:
+        raw = raw.rstrip('\r\n')
+        if raw[:1] in (' ', '\t') and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def read_vcard(file):
+    record = None
+    for line in read_vcard_lines(file):
+        key, _, value = line.partition(':')
+        key = key.split(';')[0].upper()
+        if key == 'BEGIN':
+            record = {'name': '', 'phones': [], 'emails': [], 'birthday': '', 'address': ''}
+        elif record is None:
+            continue
+        elif key == 'END':
+            yield record
+            record = None
+        elif key == 'FN' or (key == 'N' and not record['name']):
+            parts = [vcard_unescape(part) for part in value.split(';') if part]
+            record['name'] = ' '.join(parts[:2][::-1]) if key == 'N' else vcard_unescape(value)
+        elif key == 'TEL':
+            record['phones'].append(value.removeprefix('tel:'))
+        elif key == 'EMAIL':
+            record['emails'].append(value)
+        elif key == 'BDAY':
+            record['birthday'] = value
+        elif key == 'ADR':
+            record['address'] = ' '.join(vcard_unescape(part) for part in value.split(';') if part)
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'vcf': read_vcard}
+
+
+# --- імпорт ----------------------------------------------------------------------------------------------------------
+
+def normalize_record(record: dict, stats: ImportStats):
+    """Приводить запис до вигляду (name, birthday, address, phones, emails) або повертає None"""
+    name = (record.get('name') or '').strip()
+    if not name or len(name) > 30:
+        return None
+    phones = []
+    for phone in split_values(record.get('phones')):
+        phone = phone_normalizer(phone)
+        if phone is None:
+            stats.phones += 1
+        else:
+            phones.append(phone)
+    emails = []
+    for mail in split_values(record.get('emails')):
+        try:
+            emails.extend(is_valid_email(mail))
+        except AttributeError:
+            stats.emails += 1
+    birthday = parse_birthday((record.get('birthday') or '').strip())
+    address = (record.get('address') or '').strip()[:100] or None
+    return name, birthday, address, phones, emails
+
+
+def insert_chunk(chunk: dict):
+    """Вставляє пакет контактів {name: (birthday, address, phones, emails)} трьома executemany"""
+    contact_insert = dialect_insert(Contact)
+    # Для існуючих контактів заповнюємо лише відсутні дату народження та адресу
+    contact_insert = contact_insert.on_conflict_do_update(index_elements=['name'], set_={
+        'birthday': func.coalesce(Contact.birthday, contact_insert.excluded.birthday),
+        'birthday_md': func.coalesce(Contact.birthday_md, contact_insert.excluded.birthday_md),
+        'address': func.coalesce(Contact.address, contact_insert.excluded.address)})
+    session.execute(contact_insert, [{'name': name, 'birthday': birthday, 'birthday_md': birthday_key(birthday),
+                                      'address': address} for name, (birthday, address, _, _) in chunk.items()])
+    ids = dict(session.execute(select(Contact.name, Contact.id).where(Contact.name.in_(list(chunk)))).all())
+    phones = [{'contact_id': ids[name], 'phone_number': phone} for name, (_, _, phones, _) in chunk.items()
+              for phone in phones]
+    emails = [{'contact_id': ids[name], 'mail': mail} for name, (_, _, _, emails) in chunk.items() for mail in emails]
+    if phones:
+        session.execute(dialect_insert(Phone).on_conflict_do_nothing(index_elements=['phone_number']), phones)
+    if emails:
+        session.execute(dialect_insert(Email).on_conflict_do_nothing(index_elements=['mail']), emails)
+    session.commit()
+
+
+def import_contacts(filename: str, progress=print) -> ImportStats:
+    reader = READERS[file_format(filename)]
+    stats = ImportStats()
+    chunk = {}
+    with open(filename, newline='', encoding='utf-8') as file:
+        for record in reader(file):
+            stats.records += 1
+            record = normalize_record(record, stats)
+            if record is None:
+                stats.rejected += 1
+                continue
+            name, birthday, address, phones, emails = record
+            if name in chunk:
+                # Повтор контакту в межах пакета: об'єднуємо, бо один INSERT не може змінити рядок двічі
+                old_birthday, old_address, old_phones, old_emails = chunk[name]
+                record = (old_birthday or birthday, old_address or address, old_phones + phones, old_emails + emails)
+                chunk[name] = record
+            else:
+                chunk[name] = (birthday, address, phones, emails)
+            if len(chunk) >= CHUNK_SIZE:
+                insert_chunk(chunk)
+                chunk = {}
+                progress(f'Imported {stats}')
+        if chunk:
+            insert_chunk(chunk)
+    return stats
+
+
+# --- експорт ---------------------------------------------------------------------------------------------------------
+
+def contact_record(contact: Contact) -> dict:
+    return {'name': contact.name, 'phones': [phone.phone_number for phone in contact.phones],
+            'emails': [email.mail for email in contact.emails],
+            'birthday': contact.birthday.isoformat() if contact.birthday else '', 'address': contact.address or ''}
+
+
+def write_csv(file, records):
+    writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(dict(record, phones='; '.join(record['phones']), emails='; '.join(record['emails'])))
+        yield
+
+
+def write_json(file, records):
+    file.write('[')
+    separator = '\n'
+    for record in records:
+        file.write(separator + json.dumps(record, ensure_ascii=False))
+        separator = ',\n'
+        yield
+    file.write('\n]\n')
+
+
+def vcard_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace(',', '\\,').replace(';', '\\;')
+
+
+def write_vcard(file, records):
+    for record in records:
+        lines = ['BEGIN:VCARD', 'VERSION:3.0', f'FN:{vcard_escape(record["name"])}',
+                 f'N:{vcard_escape(record["name"])};;;;']
+        lines += [f'TEL:{phone}' for phone in record['phones']]
+        lines += [f'EMAIL:{mail}' for mail in record['emails']]
+        if record['birthday']:
+            lines.append(f'BDAY:{record["birthday"]}')
+        if record['address']:
+            lines.append(f'ADR:;;{vcard_escape(record["address"])};;;;')
+        lines.append('END:VCARD')
+        file.write('\r\n'.join(lines) + '\r\n')
+        yield
+
+
+WRITERS = {'csv': write_csv, 'json': write_json, 'vcf': write_vcard}
+
+
+def export_contacts(filename: str, progress=print) -> int:
+    writer = WRITERS[file_format(filename)]
+    start, count = time(), 0
+    # Серверний курсор: контакти надходять пакетами по CHUNK_SIZE, телефони та пошта - по пакету
+    contacts = session.query(Contact).options(selectinload(Contact.phones), selectinload(Contact.emails)) \
+        .order_by(Contact.name).execution_options(stream_results=True).yield_per(CHUNK_SIZE)
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        for _ in writer(file, (contact_record(contact) for contact in contacts)):
+            count += 1
+            if count % CHUNK_SIZE == 0:
+                progress(f'Exported {count} records, {count / max(time() - start, 1e-6):.0f} records/s')
+    session.commit()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import or export addressbook contacts (CSV, JSON, vCard)')
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('filename')
+    args = parser.parse_args()
+    if args.action == 'import':
+        print(f'Imported {import_contacts(args.filename)}')
+    else:
+        start = time()
+        print(f'Exported {export_contacts(args.filename)} records in {time() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Визначення теки призначення файлу за розширенням і, де розширення недостатньо, за вмістом (сигнатурою).
+
+Вміст читається лише для архівів (архівом вважається тільки файл із зареєстрованим розширенням архіву
+та сигнатурою архіву, тож підроблений архів не потрапляє на розпаковування, а .epub / .jar не розпаковуються)
+та для файлів без розширення або з незареєстрованим розширенням.
+Читаються перші HEADER_SIZE байтів одним os.pread, результат кешується за (пристрій, inode, mtime).
+"""
+import configparser
+import os
+from pathlib import Path
+
+HEADER_SIZE = 512  # байтів початку файлу (сигнатура tar - на зсуві 257)
+SNIFF_CACHE = 1 << 16  # файлів у кеші визначених за вмістом типів
+
+# (тека, розширення, зсув, сигнатура); лише формати, які вміє розпаковувати extract_archive, - ARCHIVES
+MAGIC = [
+    ('IMAGES', 'JPG', 0, b'\xff\xd8\xff'),
+    ('IMAGES', 'PNG', 0, b'\x89PNG\r\n\x1a\n'),
+    ('IMAGES', 'GIF', 0, b'GIF87a'),
+    ('IMAGES', 'GIF', 0, b'GIF89a'),
+    ('IMAGES', 'WEBP', 8, b'WEBP'),
+    ('IMAGES', 'ICO', 0, b'\x00\x00\x01\x00'),
+    ('AUDIO', 'MP3', 0, b'ID3'),
+    ('AUDIO', 'OGG', 0, b'OggS'),
+    ('AUDIO', 'FLAC', 0, b'fLaC'),
+    ('AUDIO', 'WAV', 8, b'WAVE'),
+    ('AUDIO', 'AMR', 0, b'#!AMR'),
+    ('VIDEO', 'AVI', 8, b'AVI '),
+    ('VIDEO', 'MKV', 0, b'\x1a\x45\xdf\xa3'),
+    ('VIDEO', 'MP4', 4, b'ftyp'),
+    ('VIDEO', 'MOV', 4, b'ftypqt'),
+    ('VIDEO', 'WMV', 0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'),
+    ('DOCUMENTS', 'PDF', 0, b'%PDF-'),
+    ('DOCUMENTS', 'RTF', 0, b'{\\rtf'),
+    ('DOCUMENTS', 'DOC', 0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),
+    ('PROGRAMS', 'EXE', 0, b'MZ'),
+    ('PROGRAMS', 'ELF', 0, b'\x7fELF'),
+    ('ARCHIVES', 'ZIP', 0, b'PK\x03\x04'),
+    ('ARCHIVES', 'ZIP', 0, b'PK\x05\x06'),
+    ('ARCHIVES', 'GZ', 0, b'\x1f\x8b'),
+    ('ARCHIVES', 'TAR', 257, b'ustar'),
+]
+
+MISSING = object()
+
+
+def compile_magic(signatures: list) -> list:
+    """[(зсув, довжина, {сигнатура: (тека, розширення)})]: один зріз заголовка і пошук у словнику на кожну
+    пару (зсув, довжина). Довші сигнатури перевіряються першими (ftypqt раніше за ftyp)"""
+    table = {}
+    for container, ext, offset, signature in signatures:
+        table.setdefault((offset, len(signature)), {})[signature] = (container, ext)
+    return sorted(((offset, length, found) for (offset, length), found in table.items()), key=lambda item: -item[1])
+
+
+class Classifier:
+    """Реєстр типів файлів: розширення -> тека та сигнатури вмісту. Доповнюється через register або з config.ini"""
+
+    def __init__(self, extensions: dict, signatures: list, containers=()):
+        self.extensions = dict(extensions)
+        self.signatures = list(signatures)
+        self.containers = {*containers, *self.extensions.values(), *(item[0] for item in self.signatures)}
+        self.table = compile_magic(self.signatures)
+        self.cache = {}  # (st_dev, st_ino, st_mtime_ns): (тека, розширення) або None
+
+    def register(self, container: str, ext: str, offset: int = None, signature: bytes = None):
+        """Додає розширення (і, якщо вказано, сигнатуру вмісту) до теки container"""
+        self.containers.add(container)
+        if signature is None:
+            self.extensions[ext] = container
+            return
+        self.signatures.append((container, ext, offset, signature))
+        self.table = compile_magic(self.signatures)
+        self.cache.clear()
+
+    def load_config(self, filename: Path):
+        """Секції config.ini: [FILE_TYPES] - рядки "розширення = тека" (HEIC = IMAGES);
+        [FILE_MAGIC] - рядки "тека/розширення = зсув:сигнатура у hex" (IMAGES/HEIC = 4:6674797068656963).
+        Нова тека стає ще однією текою призначення."""
+        config = configparser.ConfigParser()
+        config.read(filename)
+        if config.has_section('FILE_TYPES'):
+            for ext, container in config.items('FILE_TYPES'):
+                self.register(container.upper(), ext.upper())
+        if config.has_section('FILE_MAGIC'):
+            for name, value in config.items('FILE_MAGIC'):
+                container, _, ext = name.upper().partition('/')
+                offset, _, signature = value.partition(':')
+                try:
+                    self.register(container, ext, int(offset), bytes.fromhex(signature))
+                except ValueError:
+                    raise ValueError(f'{filename}: bad FILE_MAGIC entry {name} = {value}, expected offset:hex')
+
+    def sniff(self, header: bytes):
+        """(тека, розширення) за сигнатурою або None"""
+        for offset, length, found in self.table:
+            result = found.get(header[offset:offset + length])
+            if result is not None:
+                return result
+        return None
+
+    def sniff_file(self, path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        result = self.cache.get(key, MISSING)
+        if result is not MISSING:
+            return result
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                header = os.pread(fd, HEADER_SIZE, 0) if hasattr(os, 'pread') else os.read(fd, HEADER_SIZE)
+            finally:
+                os.close(fd)
+        except OSError:
+            return None
+        result = self.sniff(header)
+        if len(self.cache) >= SNIFF_CACHE:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
+
+    def classify(self, path: str, ext: str) -> (str, str):
+        """Тека призначення та розширення (тека всередині неї) для файлу path з розширенням ext"""
+        container = self.extensions.get(ext)
+        if container is not None and container != 'ARCHIVES':
+            # Відоме розширення, яке не йде на розпаковування, - вміст не читаємо
+            return container, ext
+        sniffed = self.sniff_file(path)
+        if container == 'ARCHIVES' and sniffed is not None and sniffed[0] == 'ARCHIVES':
+            return container, ext
+        # Архівом вважається лише файл із зареєстрованим розширенням архіву: ZIP / GZIP з невідомим
+        # розширенням (.epub, .jar, .odt, .apk, .whl) - це файл свого формату, його не розпаковуємо
+        if sniffed is None or sniffed[0] == 'ARCHIVES':
+            return 'OTHERS', ext
+        return sniffed
@@ -0,0 +1,206 @@
+"""Пошук однакових за вмістом файлів: розмір -> хеш початку файлу -> хеш усього файлу.
+
+Хеш рахується лише для файлів, у яких збігся розмір, повний хеш - лише для тих, у яких збігся і хеш початку.
+Файли читаються через mmap без копіювання в пам'ять процесу, хеші зберігаються в кеші з ключем
+(inode, розмір, mtime), тому повторний запуск не перечитує незмінені файли.
+"""
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+from collections import defaultdict
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PARTIAL_SIZE = 1 << 16  # байтів початку файлу для попереднього порівняння
+HASH_CHUNK = 1 << 24  # байтів, що передаються в hashlib за раз
+HASH_WORKERS = os.cpu_count() or 1  # hashlib звільняє GIL, тож потоки рахують хеші паралельно
+
+
+def file_hash(path: str, limit: int = None) -> str:
+    """blake2b перших limit байтів файлу (усього файлу, якщо limit не вказано)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if limit is None else min(size, limit)
+        if end:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for start in range(0, end, HASH_CHUNK):
+                        digest.update(view[start:min(start + HASH_CHUNK, end)])
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Збережені хеші файлів: {'inode:size:mtime': [хеш початку, хеш файлу]}.
+
+    Файл кешу містить лише файли останнього запуску, тож не росте з кожним запуском.
+    """
+
+    def __init__(self, filename: Path = None):
+        self.filename = filename
+        self.loaded = {}
+        self.used = {}
+        if filename is not None and filename.exists():
+            try:
+                self.loaded = json.loads(filename.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self.loaded = {}
+
+    @staticmethod
+    def key(stat: os.stat_result) -> str:
+        return f'{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    def get(self, path: str, stat: os.stat_result, full: bool) -> str:
+        key = self.key(stat)
+        hashes = self.used.get(key) or self.loaded.get(key) or [None, None]
+        self.used[key] = hashes
+        index = 1 if full or stat.st_size <= PARTIAL_SIZE else 0
+        if hashes[index] is None:
+            hashes[index] = file_hash(path, None if index else PARTIAL_SIZE)
+        return hashes[index]
+
+    def save(self):
+        if self.filename is None or self.used == self.loaded:
+            return
+        # Файл перезаписується на місці: новий файл поруч змінив би mtime теки (див. Manifest).
+        # Пошкоджений кеш просто не завантажиться
+        self.filename.write_text(json.dumps(self.used, separators=(',', ':')), encoding='utf-8')
+
+
+def group_by(paths: list, key, pool: ThreadPoolExecutor) -> list:
+    """Розбиває paths на групи з однаковим key(path), лишає групи з кількох файлів"""
+    def safe_key(path):
+        try:
+            return key(path)
+        except OSError:
+            return path  # файл не прочитався - окрема група, тобто не дублікат
+
+    groups = defaultdict(list)
+    for path, value in zip(paths, pool.map(safe_key, paths)):
+        groups[value].append(path)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(paths: list, cache: HashCache) -> dict:
+    """Повертає {шлях дубліката: шлях оригіналу}; оригінал - перший з однакових файлів за шляхом.
+
+    Порожні файли не вважаються дублікатами.
+    """
+    stats, by_size = {}, defaultdict(list)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_size:
+            stats[path] = stat
+            by_size[stat.st_size].append(path)
+    duplicates = {}
+    with ThreadPoolExecutor(HASH_WORKERS) as pool:
+        for group in by_size.values():
+            if len(group) < 2:
+                continue
+            for same_start in group_by(group, lambda path: cache.get(path, stats[path], False), pool):
+                if stats[same_start[0]].st_size > PARTIAL_SIZE:
+                    same = group_by(same_start, lambda path: cache.get(path, stats[path], True), pool)
+                else:
+                    same = [same_start]
+                for group_same in same:
+                    original, *copies = sorted(group_same)
+                    for copy in copies:
+                        duplicates[copy] = original
+    return duplicates
+
+
+class Manifest:
+    """Стан дерева після попереднього запуску сортувальника (SQLite) для інкрементного режиму.
+
+    folders - теки, що лишилися після сортування: mtime та вкладені теки. Якщо mtime теки не змінився,
+    файли в ній ті самі, і теку можна не читати, а лише перевірити її вкладені теки (зміни у вкладеній
+    теці не змінюють mtime батьківської). left - файли, які не вдалося або не треба було переміщувати
+    (не архів, дублікат, помилка): коли теку читають знову, вони пропускаються, якщо не змінилися
+    їхні розмір і mtime.
+    Стан завантажується в пам'ять на початку і записується однією транзакцією в кінці.
+    """
+
+    def __init__(self, filename: Path):
+        self.filename = filename
+        self.folders = {}  # шлях: (mtime_ns, [вкладені теки])
+        self.left = {}  # шлях: (розмір, mtime_ns)
+        self.unchanged = set()  # теки цього запуску, які не читалися
+        self.changed = set()  # теки цього запуску, які читалися
+        if not filename.exists():
+            return
+        try:
+            with closing(sqlite3.connect(filename)) as connection:
+                self.folders = {path: (mtime, subfolders.split('\n') if subfolders else []) for path, mtime, subfolders
+                                in connection.execute('SELECT path, mtime, subfolders FROM folders')}
+                self.left = {path: (size, mtime) for path, size, mtime
+                             in connection.execute('SELECT path, size, mtime FROM left_files')}
+        except sqlite3.DatabaseError:
+            # Немає маніфесту (перший запуск) або він пошкоджений - повне сканування
+            self.folders, self.left = {}, {}
+
+    def known_subfolders(self, folder: str):
+        """Вкладені теки, якщо тека не змінилася з попереднього запуску, інакше None"""
+        known = self.folders.get(folder)
+        if known is None or os.stat(folder).st_mtime_ns != known[0]:
+            self.changed.add(folder)
+            return None
+        self.unchanged.add(folder)
+        return [os.path.join(folder, name) for name in known[1]]
+
+    def is_left(self, entry: os.DirEntry) -> bool:
+        known = self.left.get(entry.path)
+        if known is None:
+            return False
+        stat = entry.stat(follow_symlinks=False)
+        return known == (stat.st_size, stat.st_mtime_ns)
+
+    def folder_state(self, folder: str, left: set, skip, folders: dict, left_files: dict):
+        """Записує стан теки після сортування, якщо всі файли в ній - залишені сортувальником"""
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+            subfolders, files = [], {}
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not skip(entry.name, True):
+                            subfolders.append(entry.name)
+                    elif not skip(entry.name, False):
+                        if entry.path not in left and entry.path not in self.left:
+                            # Файл з'явився під час сортування - теку треба прочитати наступного разу
+                            return
+                        stat = entry.stat(follow_symlinks=False)
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            if os.stat(folder).st_mtime_ns != mtime:
+                return
+        except OSError:
+            return  # теку видалено
+        folders[folder] = (mtime, subfolders)
+        left_files.update(files)
+
+    def save(self, left: set, skip):
+        """Зберігає стан прочитаних тек; left - файли цього запуску, що лишилися на місці;
+        skip(name, is_folder) - елементи, які сортувальник не обробляє"""
+        folders = {folder: self.folders[folder] for folder in self.unchanged}
+        left_files = {path: state for path, state in self.left.items() if os.path.dirname(path) in self.unchanged}
+        for folder in self.changed:
+            self.folder_state(folder, left, skip, folders, left_files)
+        with closing(sqlite3.connect(self.filename)) as connection, connection:
+            # Журнал у пам'яті: файл журналу поруч змінював би mtime теки з маніфестом
+            connection.execute('PRAGMA journal_mode = MEMORY')
+            connection.execute('CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY, mtime INTEGER, '
+                               'subfolders TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS left_files (path TEXT PRIMARY KEY, size INTEGER, '
+                               'mtime INTEGER)')
+            connection.execute('DELETE FROM folders')
+            connection.execute('DELETE FROM left_files')
+            connection.executemany('INSERT INTO folders VALUES (?, ?, ?)',
+                                   ((path, mtime, '\n'.join(subfolders)) for path, (mtime, subfolders) in
+                                    folders.items()))
+            connection.executemany('INSERT INTO left_files VALUES (?, ?, ?)',
+                                   ((path, size, mtime) for path, (size, mtime) in left_files.items()))
@@ -0,0 +1,218 @@
+"""Файлові операції сортувальника: переміщення перейменуванням з копіюванням лише між пристроями,
+потокове розпаковування архівів"""
+import errno
+import gzip
+import os
+import shutil
+import tarfile
+import zipfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+COPY_CHUNK = 1 << 24  # байтів за один виклик copy_file_range / sendfile
+EXTRACT_CHUNK = 1 << 20  # байтів розпакованих даних у пам'яті на один елемент архіву
+# Імен, для яких пам'ятається останній виданий номер (найдавніше використані забуваються: у режимі стеження
+# імена не повторюються безкінечно, а для забутого імені номер знову шукається перевірками з _1)
+TAKEN_NUMBERS = 1 << 16
+
+
+class FolderCache:
+    """Теки, які вже створено: mkdir виконується один раз на теку, а не для кожного файлу"""
+
+    def __init__(self):
+        self.created = set()
+
+    def make(self, folder: Path):
+        if folder not in self.created:
+            folder.mkdir(exist_ok=True, parents=True)
+            self.created.add(folder)
+
+    def forget(self, folder: Path):
+        self.created.discard(folder)
+
+    def clear(self):
+        self.created.clear()
+
+
+class TakenNames:
+    """Імена, зайняті переміщеннями цього запуску, та останній виданий номер для кожного імені:
+    k файлів з однаковим іменем отримують target_1 ... target_k за O(k) перевірок, а не O(k²)"""
+
+    def __init__(self, max_numbers: int = TAKEN_NUMBERS):
+        self.names = set()
+        self.numbers = OrderedDict()
+        self.max_numbers = max_numbers
+
+    def __contains__(self, name: Path) -> bool:
+        return name in self.names
+
+    def add(self, name: Path):
+        self.names.add(name)
+
+    def discard(self, name: Path):
+        self.names.discard(name)
+        self.numbers.pop(name, None)
+
+    def last_number(self, target: Path) -> int:
+        number = self.numbers.get(target, 0)
+        if number:
+            self.numbers.move_to_end(target)
+        return number
+
+    def set_number(self, target: Path, number: int):
+        self.numbers[target] = number
+        self.numbers.move_to_end(target)
+        if len(self.numbers) > self.max_numbers:
+            self.numbers.popitem(last=False)
+
+    def clear(self):
+        self.names.clear()
+        self.numbers.clear()
+
+
+def free_target(target: Path, taken: TakenNames) -> Path:
+    """target, а якщо таке ім'я вже зайняте (файлом або іншим переміщенням) - target_1, target_2, ..."""
+    number = taken.last_number(target)
+    candidate = target.with_name(f'{target.stem}_{number}{target.suffix}') if number else target
+    while candidate in taken or os.path.lexists(candidate):
+        number += 1
+        candidate = target.with_name(f'{target.stem}_{number}{target.suffix}')
+    taken.add(candidate)
+    if number:
+        taken.set_number(target, number)
+    return candidate
+
+
+def rename_file(source: Path, target: Path) -> bool:
+    """Переміщує файл перейменуванням (атомарно, без копіювання даних).
+
+    Повертає False, якщо source і target на різних пристроях і файл треба копіювати (copy_move).
+    """
+    try:
+        os.replace(source, target)
+    except OSError as error:
+        if error.errno == errno.EXDEV:
+            return False
+        raise
+    return True
+
+
+def copy_data(source_fd: int, target_fd: int, size: int):
+    # Дані копіюються ядром, не проходячи через пам'ять процесу
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while size > 0:
+                sent = os.copy_file_range(source_fd, target_fd, min(size, COPY_CHUNK))
+                if not sent:
+                    return
+                size -= sent
+            return
+        except OSError as error:
+            # copy_file_range між різними файловими системами підтримується не всіма ядрами
+            if error.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, 'sendfile is not available')
+    offset = os.lseek(source_fd, 0, os.SEEK_CUR)
+    while size > 0:
+        sent = os.sendfile(target_fd, source_fd, offset, min(size, COPY_CHUNK))
+        if not sent:
+            return
+        offset += sent
+        size -= sent
+
+
+def copy_move(source: Path, target: Path):
+    """Переміщення між пристроями: потокове копіювання без завантаження файлу в пам'ять, потім видалення"""
+    if not source.is_file() or source.is_symlink():
+        shutil.move(source, target)
+        return
+    partial = target.with_name(target.name + '.part')
+    with open(source, 'rb') as source_file, open(partial, 'wb') as target_file:
+        try:
+            copy_data(source_file.fileno(), target_file.fileno(), os.fstat(source_file.fileno()).st_size)
+        except OSError as error:
+            # sendfile недоступний (наприклад, не Linux) - звичайне копіювання блоками
+            if error.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+            source_file.seek(0)
+            target_file.seek(0)
+            target_file.truncate()
+            shutil.copyfileobj(source_file, target_file, COPY_CHUNK)
+    shutil.copystat(source, partial)
+    # Файл з'являється під своїм іменем лише повністю скопійованим
+    os.replace(partial, target)
+    source.unlink()
+
+
+def member_path(folder: Path, name: str):
+    """Шлях для елемента архіву всередині folder або None, якщо ім'я виводить за її межі"""
+    target = (folder / name.lstrip('/')).resolve()
+    if target != folder and folder not in target.parents:
+        return None
+    return target
+
+
+def extract_member(source, folder: Path, name: str, paths: list):
+    target = member_path(folder, name)
+    if target is None:
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, 'wb') as target_file:
+        # Елемент розпаковується блоками по EXTRACT_CHUNK, тож пам'ять не залежить від його розміру
+        shutil.copyfileobj(source, target_file, EXTRACT_CHUNK)
+    paths.append(str(target))
+
+
+def extract_archive(archive: str, folder: str) -> list:
+    """Розпаковує ZIP, TAR (зокрема стиснений) або GZ потоково, повертає шляхи розпакованих файлів.
+
+    Виконується в окремому процесі (ProcessPoolExecutor), тому розпаковування не конкурує за GIL.
+    Тип визначається за вмістом, а не за розширенням; не архів - shutil.ReadError.
+    """
+    try:
+        return extract_members(archive, Path(folder).resolve())
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error) as error:
+        # Пошкоджений архів - так само, як не архів
+        raise shutil.ReadError(f'{archive}: {error}')
+
+
+def extract_members(archive: str, folder: Path) -> list:
+    paths = []
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if not info.is_dir():
+                    with zip_file.open(info) as source:
+                        extract_member(source, folder, info.filename, paths)
+        return paths
+    if tarfile.is_tarfile(archive):
+        # 'r|*' - послідовне читання без пошуку по файлу, стиснення визначається автоматично
+        with tarfile.open(archive, 'r|*') as tar_file:
+            for member in tar_file:
+                # Посилання та спеціальні файли не розпаковуємо
+                if member.isfile():
+                    with tar_file.extractfile(member) as source:
+                        extract_member(source, folder, member.name, paths)
+        return paths
+    with open(archive, 'rb') as file:
+        is_gzip = file.read(2) == b'\x1f\x8b'
+    if is_gzip:
+        with gzip.open(archive) as source:
+            try:
+                extract_member(source, folder, Path(archive).stem, paths)
+            except gzip.BadGzipFile as error:
+                raise shutil.ReadError(f'{archive}: {error}')
+        return paths
+    raise shutil.ReadError(f'{archive} is not an archive')
+
+
+def remove_empty_folders(folder: Path):
+    """Видаляє порожні теки всередині folder і саму folder, якщо вона стала порожньою"""
+    for path, folders, files in os.walk(folder, topdown=False):
+        if not files:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
@@ -1,8 +1,22 @@
-import aioshutil
+from units.file_classifier import MAGIC, Classifier
+from units.file_index import HashCache, Manifest, find_duplicates
+from units.file_ops import FolderCache, TakenNames, free_target, rename_file, copy_move, extract_archive, \
+    remove_empty_folders
+from units.file_plan import Journal, Step, estimate, load_plan, save_plan, sort_plan
+from units.file_watch import TreeWatcher
 from units.normalize import normalize
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from operator import itemgetter
 from pathlib import Path
+import argparse
 import asyncio
+import configparser
+import multiprocessing
+import os
+import shutil
 from time import time
+from typing import NamedTuple
 
 # from aiopath import AsyncPath
 
@@ -17,8 +31,101 @@ REGISTER_EXTENSIONS = {
     'ZIP': 'ARCHIVES', 'GZ': 'ARCHIVES', 'TAR': 'ARCHIVES'
 }
 
+TARGET_FOLDERS = ('ARCHIVES', 'VIDEO', 'AUDIO', 'DOCUMENTS', 'IMAGES', 'PROGRAMS', 'OTHERS')
+# Додаткові розширення, теки та сигнатури вмісту - секції FILE_TYPES та FILE_MAGIC (див. Classifier.load_config)
+CONFIG = Path(__file__).parent.parent / 'config.ini'
+
+WALK_THREADS = min(32, (os.cpu_count() or 1) * 4)  # потоків, що одночасно читають теки
+MOVE_THREADS = 16  # одночасних переміщень файлів (дешеві операції з метаданими)
+ARCHIVE_WORKERS = os.cpu_count() or 1  # процесів, що одночасно розпаковують архіви
+# Кроків у черзі кожного етапу виконання плану; попередній етап чекає, коли черга заповнена. Обмежує кількість
+# кроків у роботі одночасно, а не пам'ять: план (шлях кожного файлу дерева) складається і зберігається цілком
+QUEUE_SIZE = 1024
+CLASSIFY_CHUNK = 256  # файлів, що класифікуються в одному завданні пулу потоків
+# Однакові за вмістом файли: 'report' - повідомити; 'skip' - дублікат лишається на місці;
+# 'hardlink' - дублікат стає жорстким посиланням на оригінал (оригінал - перший за шляхом)
+DEDUP_MODES = ('report', 'skip', 'hardlink')
+# Службові файли сортувальника - в окремій теці у work_folder, яка не сортується. Файли, що створюються
+# та видаляються в ній (план, журнал), не змінюють mtime самої work_folder, тож в інкрементному режимі
+# незмінена work_folder не читається знову
+SERVICE_FOLDER = '.file_parser'
+HASH_CACHE = 'hashes.json'
+MANIFEST = 'manifest.sqlite3'
+PLAN = 'plan.json'  # план незавершеного сортування
+JOURNAL = 'journal'  # виконані кроки плану
+WATCH_METRICS = 'metrics.json'  # глибина черги та затримка обробки в режимі стеження
+METRICS_INTERVAL = 5  # секунд між оновленнями WATCH_METRICS
+
 FOLDERS = []
 work_folder = Path('.')
+scheduler = None
+target_folders = FolderCache()
+taken_targets = TakenNames()  # імена, зайняті файлами цього запуску
+LEFT = set()  # файли цього запуску, що лишилися на місці (не архів, дублікат, помилка)
+manifest = None
+classifier = Classifier(REGISTER_EXTENSIONS, MAGIC, TARGET_FOLDERS)
+classifier.load_config(CONFIG)
+
+
+class SortOptions(NamedTuple):
+    """Налаштування запуску: секція [FILE_PARSER] у config.ini, ключі командного рядка мають перевагу"""
+    dedup: str = None  # одна з DEDUP_MODES; None - дублікати не шукаються
+    # Інкрементний режим: теки та файли, що не змінилися після попереднього запуску, не читаються знову
+    incremental: bool = False
+    sort_extracted: bool = False  # розкладати вміст архівів по теках разом з іншими файлами (вкладені архіви лишаються)
+
+
+def load_options(filename: Path) -> SortOptions:
+    """Налаштування з секції [FILE_PARSER] config.ini: dedup = report | skip | hardlink,
+    incremental = yes | no, sort_extracted = yes | no"""
+    config = configparser.ConfigParser()
+    config.read(filename)
+    dedup = config.get('FILE_PARSER', 'dedup', fallback='').lower() or None
+    if dedup is not None and dedup not in DEDUP_MODES:
+        raise ValueError(f'{filename}: bad FILE_PARSER entry dedup = {dedup}, expected {" | ".join(DEDUP_MODES)}')
+    return SortOptions(dedup, config.getboolean('FILE_PARSER', 'incremental', fallback=False),
+                       config.getboolean('FILE_PARSER', 'sort_extracted', fallback=False))
+
+
+class Scheduler:
+    """Виконання операцій над файлами в окремих пулах.
+
+    Переміщення - у пулі потоків, розпаковування архівів - у пулі процесів (розпаковування навантажує
+    процесор і в потоках конкурувало б за GIL). Кожен пул має свій семафор, тож довгі розпаковування
+    не займають потоки переміщень, а кількість одночасно відкритих файлів обмежена розміром пулів.
+    """
+
+    def __init__(self, move_threads: int = MOVE_THREADS, archive_workers: int = ARCHIVE_WORKERS):
+        self.move_pool = ThreadPoolExecutor(move_threads, thread_name_prefix='move')
+        # spawn: fork процесу, в якому вже працюють потоки, може заблокуватися
+        self.archive_pool = ProcessPoolExecutor(archive_workers, mp_context=multiprocessing.get_context('spawn'))
+        self.moves = asyncio.Semaphore(move_threads)
+        self.archives = asyncio.Semaphore(archive_workers)
+
+    async def move(self, func, *args):
+        async with self.moves:
+            return await asyncio.get_running_loop().run_in_executor(self.move_pool, func, *args)
+
+    async def unpack(self, func, *args):
+        async with self.archives:
+            return await asyncio.get_running_loop().run_in_executor(self.archive_pool, func, *args)
+
+    def shutdown(self):
+        self.move_pool.shutdown()
+        self.archive_pool.shutdown()
+
+
+class SortStats:
+    def __init__(self):
+        self.start = time()
+        self.counts = Counter()  # files, moved, unpacked, skipped, errors
+
+    def __str__(self):
+        seconds = time() - self.start
+        return f'{self.counts["files"]} files ({self.counts["moved"]} moved, {self.counts["duplicates"]} duplicates, ' \
+               f'{self.counts["unpacked"]} archives ' \
+               f'unpacked, {self.counts["skipped"]} skipped, {self.counts["errors"]} errors) in {seconds:.1f} s, ' \
+               f'{self.counts["files"] / max(seconds, 1e-6):.0f} files/s'
 
 
 def get_extension(filename: str) -> str:
@@ -26,69 +133,127 @@ def get_extension(filename: str) -> str:
     return Path(filename).suffix[1:].upper()
 
 
+def target_folder(container: str, ext: str) -> Path:
+    if container == 'ARCHIVES' or (container == 'OTHERS' and not ext):
+        return work_folder / container
+    return work_folder / container / ext
+
+
 async def sort_files(file: Path, container: str, ext: str):
     if container == 'ARCHIVES':
-        await handle_archive(file, work_folder / container)
-    elif container == 'OTHERS' and not ext:
-        new_file = work_folder / container
-        await handle_file(file, new_file)
+        await handle_archive(file, target_folder(container, ext))
     else:
-        new_file = work_folder / container / ext
-        await handle_file(file, new_file)
-
-
-async def scan_item(folder: Path, item: Path) -> None:
-    # Якщо це тека, то додаємо її до списку FOLDERS і переходимо до наступного елемента теки
-    if item.is_dir():
-        # Перевіряємо, щоб тека не була тією, в яку ми вже складаємо файли
-        if item.name not in ('ARCHIVES', 'VIDEO', 'AUDIO', 'DOCUMENTS', 'IMAGES', 'PROGRAMS', 'OTHERS'):
-            FOLDERS.append(item)
-            #  Скануємо цю вкладену теку – рекурсія
-            subtasks = [scan_item(item, subfolder) for subfolder in item.iterdir()]
-            await asyncio.gather(*subtasks)
-            # for subfolder in item.iterdir():
-            #     await scan_item(item, subfolder)
-        #  Перейти до наступного елемента у сканованій теці
-        return
+        await handle_file(file, target_folder(container, ext))
 
-    #  Пішла робота з файлом
-    ext = get_extension(item.name)  # взяти розширення файлу
-    fullname = folder / item.name  # взяти повний шлях к файлу
-    if not ext:  # якщо файл не має розширення, додати до невідомих
-        # OTHER.append(fullname)
-        container = 'OTHERS'
-    else:
-        try:
-            # Взяти список, куди покласти повний шлях до файлу
-            container = REGISTER_EXTENSIONS[ext]
-        except KeyError:
-            # Якщо ми не реєстрували розширення у REGISTER_EXTENSIONS, то додати до іншого
-            container = 'OTHERS'
-    await sort_files(fullname, container, ext)
+
+def classify(item: Path) -> (str, str):
+    """Тека призначення та розширення файлу: за розширенням, а для архівів, файлів без розширення
+    та з невідомим розширенням - за вмістом (архів, що не є архівом, не розпаковується)"""
+    return classifier.classify(str(item), get_extension(item.name))
+
+
+def classify_chunk(files: list) -> list:
+    # Шляхи - рядки: Path для кожного файлу дерева займав би в пам'яті плану більше, ніж сам шлях
+    return [(file, *classifier.classify(file, get_extension(file))) for file in files]
+
+
+def skip_entry(name: str, is_folder: bool) -> bool:
+    # Пропускаємо теки, в які ми вже складаємо файли (зокрема додані в config.ini), та теку службових файлів
+    return is_folder and (name in classifier.containers or name == SERVICE_FOLDER)
+
+
+def scan_dir(folder: str) -> (list, list):
+    """Читає одну теку (виконується в потоці): повертає шляхи файлів та вкладених тек.
+
+    Тип елемента береться з DirEntry, який os.scandir вже отримав разом з іменем, без окремого stat.
+    В інкрементному режимі незмінена тека не читається: беруться її вкладені теки з маніфесту.
+    """
+    if manifest is not None:
+        subfolders = manifest.known_subfolders(folder)
+        if subfolders is not None:
+            return [], subfolders
+    files, folders = [], []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not skip_entry(entry.name, True):
+                    folders.append(entry.path)
+            elif not skip_entry(entry.name, False) and not (manifest is not None and manifest.is_left(entry)):
+                files.append(entry.path)
+    return files, folders
+
+
+async def walk_tree(root: Path, pool: ThreadPoolExecutor):
+    """Обходить дерево тек у пулі потоків і видає файли кожної прочитаної теки (список шляхів).
+
+    Теки читаються паралельно (по одній на потік), вкладені теки додаються до FOLDERS для видалення.
+    """
+    loop = asyncio.get_running_loop()
+    scans = {loop.run_in_executor(pool, scan_dir, str(root))}
+    while scans:
+        done, scans = await asyncio.wait(scans, return_when=asyncio.FIRST_COMPLETED)
+        for scan in done:
+            try:
+                files, folders = scan.result()
+            except OSError as error:
+                print(f'Не вдалося прочитати теку: {error}')
+                continue
+            for folder in folders:
+                FOLDERS.append(Path(folder))
+                scans.add(loop.run_in_executor(pool, scan_dir, folder))
+            if files:
+                yield files
+
+
+async def finish(queue: asyncio.Queue, workers: list):
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+
+def normalized_target(filename: Path, target_folder: Path) -> Path:
+    target_folders.make(target_folder)
+    # Файли з однаковим нормалізованим ім'ям не перезаписують один одного
+    return free_target(target_folder / (normalize(filename.stem) + filename.suffix), taken_targets)
+
+
+async def move_file(source: Path, target: Path):
+    # Теки призначення зазвичай на тому ж пристрої: rename виконується одразу, без передачі в потік
+    if not rename_file(source, target):
+        await scheduler.move(copy_move, source, target)
+    # Файл уже на місці і ім'я зайняте ним самим: множина не росте з кожним файлом у режимі стеження
+    taken_targets.discard(target)
 
 
 async def handle_file(filename: Path, target_folder: Path):
-    target_folder.mkdir(exist_ok=True, parents=True)
-    # filename.replace(target_folder / (normalize(filename.stem) + filename.suffix))
-    await aioshutil.move(filename, target_folder / (normalize(filename.stem) + filename.suffix))
+    await move_file(filename, normalized_target(filename, target_folder))
 
 
-async def handle_archive(filename: Path, target_folder: Path):
-    # Створюємо теку для архівів
-    target_folder.mkdir(exist_ok=True, parents=True)
-    # Створюємо теку, куду розпаковуємо архів
+def archive_folder(filename: Path, target_folder: Path) -> Path:
     # Беремо суфікс у файлу та прибираємо replace(filename.suffix, '')
-    folder_for_file = target_folder / normalize(filename.name.replace(filename.suffix, ''))
-    # Створюємо теку для архіву з іменем файлу
+    return target_folder / normalize(filename.name.replace(filename.suffix, ''))
+
 
+async def unpack_archive(filename: Path, folder_for_file: Path):
+    """Розпаковує архів у folder_for_file; повертає шляхи розпакованих файлів або False, якщо це не архів"""
     folder_for_file.mkdir(exist_ok=True, parents=True)
+    # Тека створена і ім'я зайняте нею самою
+    taken_targets.discard(folder_for_file)
     try:
-        await aioshutil.unpack_archive(str(filename.resolve()), str(folder_for_file.resolve()))
-    except aioshutil.Error:
+        extracted = await scheduler.unpack(extract_archive, str(filename.resolve()), str(folder_for_file.resolve()))
+    except shutil.ReadError:
         print(f'Обман - це не архів {filename}!')
-        folder_for_file.rmdir()
-        return None
+        shutil.rmtree(folder_for_file, ignore_errors=True)
+        return False
     filename.unlink()
+    return extracted
+
+
+async def handle_archive(filename: Path, target_folder: Path):
+    # Створюємо теку для архівів
+    target_folders.make(target_folder)
+    # Розпаковуємо в теку з іменем архіву; архіви з однаковим нормалізованим ім'ям - у різні теки
+    return await unpack_archive(filename, free_target(archive_folder(filename, target_folder), taken_targets))
 
 
 def handle_folder(folder: Path):
@@ -98,30 +263,367 @@ def handle_folder(folder: Path):
         print(f'Не вдалося видалити теку {folder}')
 
 
-async def file_parser():
-    global FOLDERS
+async def find_files() -> list:
+    """Усі файли для сортування, впорядковані за шляхом: [(шлях, тека призначення, розширення)].
+
+    Весь список у пам'яті: імена призначаються в порядку шляхів, тож план складається лише після обходу.
+    """
+    loop = asyncio.get_running_loop()
+    chunks, chunk = [], []
+    with ThreadPoolExecutor(WALK_THREADS) as pool:
+        async for files in walk_tree(work_folder.resolve(), pool):
+            chunk.extend(files)
+            if len(chunk) >= CLASSIFY_CHUNK:
+                # Заголовки файлів читаються пакетами в потоках (os.pread звільняє GIL) ще під час обходу
+                chunks.append(loop.run_in_executor(pool, classify_chunk, chunk))
+                chunk = []
+        if chunk:
+            chunks.append(loop.run_in_executor(pool, classify_chunk, chunk))
+        classified = await asyncio.gather(*chunks)
+    found = [item for chunk in classified for item in chunk]
+    found.sort(key=itemgetter(0))
+    return found
+
+
+async def make_plan(stats: SortStats, dry_run: bool, dedup: str = None) -> list:
+    """Фаза планування: обхід дерева, класифікація, пошук дублікатів (dedup - одна з DEDUP_MODES) та вибір імен.
+
+    Диск не змінюється: теки призначення не створюються, імена вибираються з урахуванням уже
+    запланованих. Імена призначаються в порядку шляхів файлів, тож при збігу нормалізованих імен
+    file_1, file_2, ... отримують ті самі файли незалежно від порядку обходу.
+    """
+    targets = await find_files()
+    stats.counts['files'] += len(targets)
+    duplicates = {}
+    if dedup:
+        cache = HashCache(work_folder / SERVICE_FOLDER / HASH_CACHE)
+        duplicates = await asyncio.to_thread(
+            find_duplicates, [path for path, container, _ in targets if container != 'ARCHIVES'], cache)
+        if not dry_run:
+            await asyncio.to_thread(cache.save)
+    steps, planned, taken = [], {}, TakenNames()
+    for path, container, ext in targets:
+        file, folder = Path(path), target_folder(container, ext)
+        if container == 'ARCHIVES':
+            steps.append(Step('unpack', path, str(free_target(archive_folder(file, folder), taken))))
+            continue
+        original = duplicates.get(path)
+        if original is not None:
+            stats.counts['duplicates'] += 1
+            print(f'Дублікат {file} = {original}')
+            if dedup == 'skip':
+                LEFT.add(path)
+                continue
+        target = str(free_target(folder / (normalize(file.stem) + file.suffix), taken))
+        if dedup == 'hardlink':
+            planned[path] = target  # призначення оригіналів для посилань
+        if original is not None and dedup == 'hardlink':
+            steps.append(Step('link', path, target, planned[original]))
+        else:
+            steps.append(Step('move', path, target))
+    # Реверс списку: вкладені теки видаляються раніше за батьківські
+    for folder in FOLDERS[::-1]:
+        # Незмінені з попереднього запуску теки не порожні - їх не вдалося видалити й тоді
+        if manifest is None or str(folder) not in manifest.unchanged:
+            steps.append(Step('rmdir', str(folder)))
+    return sort_plan(steps)
+
+
+def plan_target(destination: str) -> Path:
+    # Ім'я могло зайнятися після планування (новий файл або інший крок) - тоді береться наступне вільне
+    destination = Path(destination)
+    target_folders.make(destination.parent)
+    return free_target(destination, taken_targets)
+
+
+def already_done(step: Step) -> bool:
+    # Крок виконано перед збоєм, але не записано в журнал
+    return not os.path.lexists(step.source) and os.path.lexists(step.destination)
+
+
+async def apply_move(step: Step):
+    if not already_done(step):
+        await move_file(Path(step.source), plan_target(step.destination))
+
+
+async def apply_link(step: Step):
+    if already_done(step):
+        return
+    source, target = Path(step.source), plan_target(step.destination)
+    try:
+        os.link(step.original, target)
+        source.unlink()
+    except OSError:
+        await move_file(source, target)
+
+
+async def step_worker(queue: asyncio.Queue, handler, counter: str, journal: Journal, stats: SortStats):
+    # index None - крок поза планом (файли розпакованих архівів), у журнал не пишеться
+    while (item := await queue.get()) is not None:
+        index, step = item
+        try:
+            await handler(step)
+        except Exception as error:
+            stats.counts['errors'] += 1
+            print(f'Не вдалося обробити файл {step.source}: {error}')
+            LEFT.add(step.source)
+            continue
+        stats.counts[counter] += 1
+        if index is not None:
+            journal.mark(index)
+
+
+async def archive_worker(archives: asyncio.Queue, moves: asyncio.Queue, journal: Journal, stats: SortStats,
+                         extracted_folders: list = None):
+    # extracted_folders - теки розпакованих архівів, вміст яких розкладається по теках; None - вміст лишається
+    while (item := await archives.get()) is not None:
+        index, step = item
+        if already_done(step):
+            journal.mark(index)
+            continue
+        try:
+            # Вільне ім'я теки вибрано під час планування; якщо тека вже є, це незавершене розпаковування
+            # цього ж плану, і архів розпаковується в неї знову
+            folder_for_file = Path(step.destination)
+            target_folders.make(folder_for_file.parent)
+            extracted = await unpack_archive(Path(step.source), folder_for_file)
+        except Exception as error:
+            stats.counts['errors'] += 1
+            print(f'Не вдалося обробити файл {step.source}: {error}')
+            LEFT.add(step.source)
+            continue
+        journal.mark(index)
+        if extracted is False:
+            stats.counts['skipped'] += 1
+            LEFT.add(step.source)
+            continue
+        stats.counts['unpacked'] += 1
+        if extracted_folders is not None:
+            for path in map(Path, extracted):
+                container, ext = classify(path)
+                if container != 'ARCHIVES':
+                    stats.counts['files'] += 1
+                    destination = target_folder(container, ext) / (normalize(path.stem) + path.suffix)
+                    await moves.put((None, Step('move', str(path), str(destination))))
+            extracted_folders.append(folder_for_file)
+
+
+async def apply_plan(plan: list, journal: Journal, stats: SortStats, sort_extracted: bool = False):
+    """Фаза виконання: кроки плану в порядку sort_plan, крім уже записаних у журнал.
+
+    Переміщення та розпаковування виконуються одночасно у своїх пулах і з'єднані обмеженими чергами,
+    посилання - після переміщень, теки видаляються останніми.
+    """
+    moves, archives = asyncio.Queue(QUEUE_SIZE), asyncio.Queue(QUEUE_SIZE)
+    movers = [asyncio.create_task(step_worker(moves, apply_move, 'moved', journal, stats))
+              for _ in range(MOVE_THREADS)]
+    extracted_folders = [] if sort_extracted else None
+    unpackers = [asyncio.create_task(archive_worker(archives, moves, journal, stats, extracted_folders))
+                 for _ in range(ARCHIVE_WORKERS)]
+    links, folders = asyncio.Queue(), []
+    for index, step in enumerate(plan):
+        if index in journal.done:
+            continue
+        if step.action == 'unpack':
+            await archives.put((index, step))
+        elif step.action == 'move':
+            await moves.put((index, step))
+        elif step.action == 'link':
+            links.put_nowait((index, step))
+        else:
+            folders.append((index, step))
+    # Розпаковані файли ще можуть надходити на переміщення, тому спершу завершуємо архіви
+    await finish(archives, unpackers)
+    await finish(moves, movers)
+    # Посилання - після переміщень, коли оригінали вже на своїх місцях
+    await finish(links, [asyncio.create_task(step_worker(links, apply_link, 'moved', journal, stats))])
+    for folder in extracted_folders or ():
+        remove_empty_folders(folder)
+    for index, step in folders:
+        if os.path.lexists(step.source):
+            handle_folder(Path(step.source))
+        journal.mark(index)
+    journal.flush()
+
+
+def print_plan(plan: list, seconds: float) -> str:
+    for step in plan:
+        print(f'{step.action:<6} {step.source}' + (f' -> {step.destination}' if step.destination else ''))
+    totals = estimate(plan, os.stat(work_folder).st_dev, ARCHIVE_WORKERS)
+    for action, (count, size, action_seconds) in totals.items():
+        if count:
+            print(f'{action:<6} {count} steps, {size / (1 << 20):.1f} MiB, ~{action_seconds:.1f} s')
+    return f'\nDry run: {len(plan)} steps planned in {seconds:.1f} s, ' \
+           f'estimated apply time ~{sum(total[2] for total in totals.values()):.1f} s'
+
+
+async def file_parser(dry_run: bool = False, options: SortOptions = SortOptions()):
+    """Сортує work_folder: складає план (make_plan), зберігає його та виконує (apply_plan).
+
+    Якщо попередній запуск не завершився, виконується його збережений план без кроків з журналу.
+    dry_run - лише надрукувати план і оцінку часу виконання, нічого не змінюючи на диску.
+    """
+    global FOLDERS, scheduler, manifest
 
     FOLDERS = []
+    target_folders.clear()
+    taken_targets.clear()
+    LEFT.clear()
     if not work_folder.exists():
         return f'\nТеки {work_folder} не існує!'
-    print(f'\n\033[033mScanning {work_folder.resolve()}...\033[0m')
+    root = work_folder.resolve()
+    service = root / SERVICE_FOLDER
+    if not dry_run:
+        # До обходу: створення теки змінює mtime root лише в першому запуску
+        service.mkdir(exist_ok=True)
+    manifest = Manifest(service / MANIFEST) if options.incremental else None
+    stats = SortStats()
+    plan = load_plan(service / PLAN)
+    journal = Journal(service / JOURNAL)
+    if plan is not None:
+        print(f'\n\033[033mResuming unfinished plan in {root}...\033[0m')
+        stats.counts['files'] += sum(step.action != 'rmdir' and index not in journal.done
+                                     for index, step in enumerate(plan))
+        if dry_run:
+            plan = [step for index, step in enumerate(plan) if index not in journal.done]
+    else:
+        print(f'\n\033[033mScanning {root}...\033[0m')
+        plan = await make_plan(stats, dry_run, options.dedup)
+        if not dry_run:
+            await asyncio.to_thread(save_plan, plan, service / PLAN)
+    if dry_run:
+        return print_plan(plan, time() - stats.start)
 
-    # Скануємо початкову теку
-    tasks = [(scan_item(work_folder.resolve(), item)) for item in work_folder.iterdir()]
-    await asyncio.gather(*tasks, return_exceptions=True)
+    scheduler = Scheduler()
+    try:
+        await apply_plan(plan, journal, stats, options.sort_extracted)
+    finally:
+        scheduler.shutdown()
+        journal.close()
+    # План виконано повністю - наступний запуск почне з обходу дерева
+    (service / PLAN).unlink()
+    (service / JOURNAL).unlink(missing_ok=True)
+    if manifest is not None:
+        await asyncio.to_thread(manifest.save, LEFT, skip_entry)
+    return f'\nТека {work_folder} відсортована: {stats}'
 
-    # Виконуємо реверс списку для того, щоб всі теки видалити.
-    for folder in FOLDERS[::-1]:
-        handle_folder(folder)
-    return f'\nТека {work_folder} відсортована'
 
-def start_fp():
+async def watch_worker(watcher: TreeWatcher, sort_extracted: bool):
+    while True:
+        path, first_event = await watcher.ready.get()
+        file = Path(path)
+        if not os.path.lexists(file):
+            continue  # файл видалено або вже відсортовано
+        watcher.in_progress += 1
+        try:
+            container, ext = classify(file)
+            folder = target_folder(container, ext)
+            if container != 'ARCHIVES':
+                await handle_file(file, folder)
+            else:
+                target_folders.make(folder)
+                folder_for_file = free_target(archive_folder(file, folder), taken_targets)
+                extracted = await unpack_archive(file, folder_for_file)
+                if extracted and sort_extracted:
+                    for item in map(Path, extracted):
+                        if (item_target := classify(item))[0] != 'ARCHIVES':
+                            await handle_file(item, target_folder(*item_target))
+                    remove_empty_folders(folder_for_file)
+            watcher.metrics.done(first_event)
+        except Exception as error:
+            watcher.metrics.errors += 1
+            print(f'Не вдалося обробити файл {file}: {error}')
+        finally:
+            watcher.in_progress -= 1
+        watcher.remove_empty(os.path.dirname(path))
+
+
+async def watch_folder(options: SortOptions = SortOptions()):
+    """Сортує теку, а потім стежить за нею (inotify) і сортує кожен новий файл, щойно його дописано.
+
+    Обробляються лише файли з подій, дерево повторно не обходиться. Метрики (глибина черги, затримка
+    від першої події файлу до завершення обробки) кожні METRICS_INTERVAL секунд записуються у WATCH_METRICS.
+    """
+    global scheduler
+
+    if not work_folder.exists():
+        print(f'\nТеки {work_folder} не існує!')
+        return
+    root = work_folder.resolve()
+    # Стеження починається до першого сортування, щоб не пропустити файли, що з'являться під час нього
+    watcher = TreeWatcher(root, skip_entry)
+    tasks = []
+    try:
+        print(await file_parser(options=options))
+        scheduler = Scheduler()
+        tasks = [asyncio.create_task(watcher.run())]
+        tasks += [asyncio.create_task(watch_worker(watcher, options.sort_extracted))
+                  for _ in range(MOVE_THREADS)]
+        print(f'\n\033[033mWatching {root}... (Ctrl+C to stop)\033[0m')
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL)
+            watcher.write_metrics(root / SERVICE_FOLDER / WATCH_METRICS)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            scheduler.shutdown()
+            watcher.write_metrics(root / SERVICE_FOLDER / WATCH_METRICS)
+            print(f'\nWatch stopped: {watcher.metrics.snapshot(watcher.queue_depth)}')
+        watcher.close()
+
+
+def start_fp(options: SortOptions = None):
     global work_folder
 
     work_folder = Path(input('Enter folder name >>> '))
-    print(asyncio.run(file_parser()))
+    print(asyncio.run(file_parser(options=options or load_options(CONFIG))))
     input('\nPress any key...')
 
 
+def main():
+    global work_folder
+
+    parser = argparse.ArgumentParser(description='Sort files in a folder by type')
+    parser.add_argument('folder', nargs='?', help='folder to sort (asked interactively if omitted)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--watch', action='store_true', help='keep watching the folder and sort new files')
+    mode.add_argument('--dry-run', action='store_true', help='print the plan and time estimate, change nothing')
+    parser.add_argument('--dedup', choices=DEDUP_MODES,
+                        help='find files with the same content and report them, leave them in place (skip) '
+                             'or replace them with hard links to the first copy (default: FILE_PARSER dedup '
+                             'in config.ini, otherwise off)')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='skip folders and files unchanged since the previous run (default: FILE_PARSER '
+                             'incremental in config.ini)')
+    parser.add_argument('--sort-extracted', action='store_true', default=None,
+                        help='sort the files unpacked from archives together with the other files (default: '
+                             'FILE_PARSER sort_extracted in config.ini)')
+    args = parser.parse_args()
+    options = load_options(CONFIG)
+    if args.dedup is not None:
+        options = options._replace(dedup=args.dedup)
+    if args.incremental:
+        options = options._replace(incremental=True)
+    if args.sort_extracted:
+        options = options._replace(sort_extracted=True)
+    if args.folder is None:
+        if args.watch or args.dry_run:
+            parser.error('a folder is required with --watch or --dry-run')
+        start_fp(options)
+        return
+    work_folder = Path(args.folder)
+    if args.dry_run:
+        print(asyncio.run(file_parser(dry_run=True, options=options)))
+    elif args.watch:
+        try:
+            asyncio.run(watch_folder(options))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(asyncio.run(file_parser(options=options)))
+
+
 if __name__ == '__main__':
-    start_fp()
+    main()
@@ -0,0 +1,118 @@
+"""План сортування: кроки (дія, джерело, призначення), збереження плану, журнал виконаних кроків, оцінка часу.
+
+План складається повністю до першої зміни на диску і зберігається у файл. Виконані кроки дописуються в журнал,
+тож після збою сортування продовжується з того ж плану, а не з напівсортованого дерева.
+"""
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+ACTIONS = ('unpack', 'move', 'link', 'rmdir')  # порядок виконання
+JOURNAL_BATCH = 1000  # виконаних кроків, що записуються в журнал за раз (fsync)
+RENAME_SECONDS = 1e-4  # оцінка: перейменування файлу або видалення теки
+COPY_RATE = 200 << 20  # оцінка: байт/с копіювання між пристроями
+UNPACK_RATE = 100 << 20  # оцінка: байт/с розпаковування одним процесом
+
+
+class Step(NamedTuple):
+    action: str  # одна з ACTIONS
+    source: str
+    destination: str = ''  # файл призначення; для 'unpack' - тека, в яку розпаковується архів
+    original: str = ''  # для 'link': призначення оригіналу, на який стане посиланням дублікат
+
+
+def sort_plan(steps: list) -> list:
+    """Впорядковує кроки для виконання.
+
+    Архіви - першими (найдовші кроки, виконуються паралельно з переміщеннями); переміщення згруповані
+    за текою призначення; посилання - після переміщень оригіналів; теки видаляються в заданому порядку.
+    """
+    by_action = {action: [] for action in ACTIONS}
+    for step in steps:
+        by_action[step.action].append(step)
+    by_action['unpack'].sort(key=lambda step: step.source)
+    by_action['move'].sort(key=lambda step: (os.path.dirname(step.destination), step.source))
+    by_action['link'].sort(key=lambda step: step.destination)
+    return [step for action in ACTIONS for step in by_action[action]]
+
+
+def save_plan(plan: list, filename: Path):
+    # Крок за кроком: JSON-масив того ж формату, але без другої копії плану в пам'яті
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write('[')
+        file.writelines((',' if index else '') + encoder.encode(step) for index, step in enumerate(plan))
+        file.write(']')
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def load_plan(filename: Path):
+    """Збережений план або None, якщо його немає чи він пошкоджений"""
+    try:
+        with open(filename, encoding='utf-8') as file:
+            return [Step(*step) for step in json.load(file)]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+class Journal:
+    """Номери виконаних кроків плану, по одному в рядку. Дописується пакетами по JOURNAL_BATCH кроків:
+    після збою до JOURNAL_BATCH виконаних кроків можуть виконатися повторно, тому кроки ідемпотентні."""
+
+    def __init__(self, filename: Path, batch: int = JOURNAL_BATCH):
+        self.filename = filename
+        self.batch = batch
+        self.done = set()
+        self.pending = []
+        self.file = None
+        if filename.exists():
+            with open(filename, encoding='utf-8') as file:
+                # Останній рядок міг записатися не повністю
+                self.done = {int(line) for line in file if line.strip().isdigit()}
+
+    def mark(self, index: int):
+        self.pending.append(index)
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.file is None:
+            self.file = open(self.filename, 'a', encoding='utf-8')
+        self.file.write(''.join(f'{index}\n' for index in self.pending))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.done.update(self.pending)
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def estimate(plan: list, device: int, unpack_workers: int) -> dict:
+    """{дія: [кроків, байтів, секунд]} - оцінка часу виконання плану; device - пристрій тек призначення"""
+    totals = {action: [0, 0, 0.0] for action in ACTIONS}
+    for step in plan:
+        total = totals[step.action]
+        total[0] += 1
+        if step.action == 'rmdir':
+            total[2] += RENAME_SECONDS
+            continue
+        try:
+            stat = os.lstat(step.source)
+        except OSError:
+            continue
+        total[1] += stat.st_size
+        if step.action == 'unpack':
+            total[2] += stat.st_size / UNPACK_RATE / unpack_workers
+        elif stat.st_dev == device:
+            total[2] += RENAME_SECONDS
+        else:
+            total[2] += stat.st_size / COPY_RATE
+    return totals
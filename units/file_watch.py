@@ -0,0 +1,176 @@
+"""Стеження за текою через Linux inotify: нові файли сортуються одразу, без повторного обходу дерева"""
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import struct
+from collections import deque
+from pathlib import Path
+from time import monotonic
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR
+EVENT = struct.Struct('iIII')  # struct inotify_event: wd, mask, cookie, len (далі len байтів імені)
+
+DEBOUNCE = 0.05  # секунд без нових подій, після яких файл вважається записаним
+LATENCY_WINDOW = 1000  # останніх файлів для обчислення затримки
+
+
+class Inotify:
+    def __init__(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self.add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError, TypeError):
+            raise OSError(errno.ENOSYS, 'Watch mode needs Linux inotify')
+        self.add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+    def add(self, folder: str) -> int:
+        wd = self.add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), folder)
+        return wd
+
+    def read(self):
+        """Події, що вже надійшли: (wd, mask, name)"""
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchMetrics:
+    def __init__(self):
+        self.events = 0
+        self.processed = 0
+        self.errors = 0
+        self.overflows = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # секунд від першої події файлу до завершення обробки
+
+    def done(self, first_event: float):
+        self.processed += 1
+        self.latencies.append(monotonic() - first_event)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(part):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * part))] * 1000, 1) if latencies else 0
+
+        return {'queue_depth': queue_depth, 'events': self.events, 'processed': self.processed, 'errors': self.errors,
+                'overflows': self.overflows, 'latency_ms_p50': percentile(0.5), 'latency_ms_p99': percentile(0.99),
+                'latency_ms_max': percentile(1)}
+
+
+class TreeWatcher:
+    """Стежить за текою root і всіма вкладеними (крім skip), віддає в ready файли, записування яких завершено.
+
+    Серія подій одного файлу (кілька записів, перейменування) об'єднується: файл потрапляє в ready,
+    коли по ньому debounce секунд не було подій. Нові теки додаються до стеження разом з файлами,
+    що з'явилися в них до початку стеження. Файли, що вже були в root при створенні, не віддаються.
+    """
+
+    def __init__(self, root: Path, skip, debounce: float = DEBOUNCE):
+        self.root = str(root)
+        self.skip = skip  # skip(name, is_folder) - не стежити / не обробляти
+        self.debounce = debounce
+        self.inotify = Inotify()
+        self.folders = {}  # wd: шлях теки
+        self.pending = {}  # шлях файлу: (час першої події, час останньої події)
+        self.ready = asyncio.Queue()
+        self.in_progress = 0
+        self.metrics = WatchMetrics()
+        self.add_tree(self.root, touch=False)
+        asyncio.get_running_loop().add_reader(self.inotify.fd, self.on_events)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.pending) + self.ready.qsize() + self.in_progress
+
+    def add_tree(self, folder: str, touch: bool = True):
+        """Додає теку з вкладеними до стеження; файли, що вже в них є, стають в чергу (touch)"""
+        try:
+            self.folders[self.inotify.add(folder)] = folder
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not self.skip(entry.name, True):
+                            self.add_tree(entry.path, touch)
+                    elif touch and not self.skip(entry.name, False):
+                        self.touch(entry.path)
+        except OSError:
+            pass  # теку вже видалено або перейменовано
+
+    def touch(self, path: str):
+        now = monotonic()
+        self.pending[path] = (self.pending.get(path, (now,))[0], now)
+
+    def on_events(self):
+        for wd, mask, name in self.inotify.read():
+            self.metrics.events += 1
+            if mask & IN_Q_OVERFLOW:
+                # Черга подій ядра переповнилася і частину подій втрачено - перечитуємо дерево
+                self.metrics.overflows += 1
+                self.add_tree(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self.folders.pop(wd, None)
+                continue
+            folder = self.folders.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not self.skip(name, True):
+                    self.add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and not self.skip(name, False):
+                self.touch(path)
+
+    async def run(self):
+        """Переносить файли з pending у ready, коли по них минув debounce"""
+        while True:
+            await asyncio.sleep(self.debounce / 2)
+            now = monotonic()
+            for path in [path for path, (_, last) in self.pending.items() if now - last >= self.debounce]:
+                self.ready.put_nowait((path, self.pending.pop(path)[0]))
+
+    def write_metrics(self, filename: Path):
+        # Перезапис на місці, без тимчасового файлу поруч (він породжував би події в теці)
+        filename.write_text(json.dumps(self.metrics.snapshot(self.queue_depth)), encoding='utf-8')
+
+    def remove_empty(self, folder: str):
+        """Видаляє спорожнілу теку та спорожнілі батьківські теки до root"""
+        while folder != self.root and folder.startswith(self.root):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                return
+            folder = os.path.dirname(folder)
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.inotify.fd)
+        self.inotify.close()
@@ -1,19 +1,71 @@
-import re
+"""Нормалізація імен файлів: транслітерація (кирилиця, грецька, латиниця з діакритикою) та заміна
+всіх символів, що не є літерами, цифрами чи _, на _. Письмові системи без транслітерації лишаються як є.
+
+Усе робить одна таблиця для str.translate: коди до PRECOMPUTED заповнені одразу, решта додаються
+при першій зустрічі (TransTable.__missing__), тож регулярний вираз не потрібен.
+"""
+import unicodedata
+from functools import lru_cache
+
+# Імен у кеші normalize: повторювані імена (image, Screenshot, Copy of ...) беруться з кешу; кеш невеликий,
+# бо на унікальних іменах він лише додає витрат
+NORMALIZE_CACHE = 1024
+PRECOMPUTED = 0x0530  # ASCII, латиниця з діакритикою, грецька, кирилиця
 
 CYRILLIC_SYMBOLS = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюяёъыэ'
 TRANSLATION = ('a', 'b', 'v', 'h', 'g', 'd', 'e', 'ie', 'zh', 'z', 'y', 'i', 'i', 'i', 'k', 'l', 'm', 'n', 'o', 'p',
                'r', 's', 't', 'u', 'f', 'kh', 'ts', 'ch', 'sh', 'shch', '', 'iu', 'ia', 'io', '', 'y', 'e')
+GREEK_SYMBOLS = 'αβγδεζηθικλμνξοπρσςτυφχψω'
+GREEK_TRANSLATION = ('a', 'v', 'g', 'd', 'e', 'z', 'i', 'th', 'i', 'k', 'l', 'm', 'n', 'x', 'o', 'p', 'r', 's', 's',
+                     't', 'y', 'f', 'ch', 'ps', 'o')
+# Латинські літери, що не розкладаються на базову літеру та діакритику
+LATIN_SYMBOLS = 'ßæœøđðłþħı'
+LATIN_TRANSLATION = ('ss', 'ae', 'oe', 'o', 'd', 'd', 'l', 'th', 'h', 'i')
+
+
+def explicit_table() -> dict:
+    table = {}
+    for symbols, translation in ((CYRILLIC_SYMBOLS, TRANSLATION), (GREEK_SYMBOLS, GREEK_TRANSLATION),
+                                 (LATIN_SYMBOLS, LATIN_TRANSLATION)):
+        for c, l in zip(symbols, translation):
+            table[c] = l
+            if len(c.upper()) == 1 and c.upper() != c:
+                table[c.upper()] = l.title()
+    return table
+
+
+EXPLICIT = explicit_table()
+
+
+def translate_char(c: str) -> str:
+    if c in EXPLICIT:
+        return EXPLICIT[c]
+    if c.isascii():
+        return c if c.isalnum() or c == '_' else '_'
+    if unicodedata.combining(c):
+        return ''  # діакритика окремим символом
+    # é -> e, Ά -> Α -> A, ² -> 2, ﬁ -> fi; розклад беремо, лише якщо він транслітерується повністю
+    base = ''.join(ch for ch in unicodedata.normalize('NFKD', c) if not unicodedata.combining(ch))
+    if base and base != c and all(ch.isascii() or ch in EXPLICIT for ch in base):
+        return ''.join(translate_char(ch) for ch in base)
+    return c if c.isalnum() else '_'
+
+
+class TransTable(dict):
+    """Таблиця для str.translate; символ, якого ще немає в таблиці, обчислюється один раз"""
+
+    def __missing__(self, code: int) -> str:
+        value = self[code] = translate_char(chr(code))
+        return value
+
 
-TRANS = {}
-for c, l in zip(CYRILLIC_SYMBOLS, TRANSLATION):
-    TRANS[ord(c)] = l
-    TRANS[ord(c.upper())] = l.title()
+TRANS = TransTable((code, translate_char(chr(code))) for code in range(PRECOMPUTED))
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE)
 def normalize(name: str) -> str:
-    t_name = name.translate(TRANS)
-    t_name = re.sub(r'\W', '_', t_name)
-    return t_name
+    # NFC: імена з розкладеною діакритикою (macOS) транслітеруються так само, як складені
+    return unicodedata.normalize('NFC', name).translate(TRANS)
 
 
 if __name__ == '__main__':
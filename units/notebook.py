@@ -2,18 +2,18 @@
 import datetime
 import re
 
-from prompt_toolkit import prompt
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.completion import NestedCompleter
-from prompt_toolkit.history import FileHistory
 
-from units.command_parser import RainbowLexer
-from units.paginator import Paginator, hyphenation_string
+from units.command_parser import CommandDispatcher, confirm, prompt_session
+from units.paginator import QueryPaginator, Listing, print_result, hyphenation_string
+from units.transaction import TRANSACTION_COMMANDS, TRANSACTION_HELP, leave_module, prompt_command
 
-from src.db import session
+from src.db import session, session_scope, dialect_insert, unit_of_work
 from src.models import Note, Tag
+from src.search import search_notes
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy import and_, not_
+from sqlalchemy import and_, func, not_, select
+from sqlalchemy.orm import selectinload
 
 
 class DateIsNotValid(Exception):
@@ -28,7 +28,9 @@ class InputError:
 
     def __call__(self, *args):
         try:
-            return self.func(*args)
+            # Зміни фіксуються (або відкочуються при помилці) після команди, див. UnitOfWork
+            with unit_of_work.command():
+                return self.func(*args)
         except KeyError:
             return 'Error! Note not found!'
         except ValueError:
@@ -41,12 +43,16 @@ class InputError:
             return 'Error! Note not found'
 
 
+def notes_query():
+    # Нотатки разом з тегами: один додатковий запит на всю сторінку, а не на кожну нотатку
+    return session.query(Note).options(selectinload(Note.tags))
+
+
 def view_note(note):
     id_ = note.id
     text_ = note.text
     date_ = datetime.date.strftime(note.execution_date, '%d %b %Y') if note.execution_date else '     -    '
-    tags_db = session.query(Tag).filter(Tag.note_id == id_).order_by(Tag.tag).all()
-    tags = [tag.tag for tag in tags_db]
+    tags = [tag.tag for tag in note.tags]
     return f"\033[34mID:\033[0m {id_:^10} {' ' * 47} \033[34mDate:\033[0m {date_}\n" \
            f"\033[34mTags:\033[0m {', '.join(tags)}\n" \
            f"{hyphenation_string(text_)}"
@@ -56,9 +62,11 @@ def view_note(note):
 def add_note(*args):
     """Додає нотатку"""
     note_text = ' '.join(args)
+    if not note_text:
+        raise IndexError
     note = Note(text=note_text)
     session.add(note)
-    session.commit()
+    session.flush()  # отримуємо id нотатки
     return f'Note ID:{note.id} added'
 
 
@@ -67,7 +75,6 @@ def change_note(*args):
     id_note, new_text = int(args[0]), ' '.join(args[1:])
     note = session.query(Note).filter(Note.id == id_note).one()
     note.text = new_text
-    session.commit()
     return f'Note ID:{id_note} changed'
 
 
@@ -75,10 +82,8 @@ def change_note(*args):
 def del_note(*args):
     id_note = int(args[0])
     session.query(Note).filter(Note.id == id_note).one()  # перевірка на існування
-    yes_no = input(f'Are you sure you want to delete the note ID:{id_note}? (Y/n) ')
-    if yes_no == 'Y':
+    if confirm(f'Are you sure you want to delete the note ID:{id_note}?'):
         session.query(Note).filter(Note.id == id_note).delete()
-        session.commit()
         return f'Note ID:{id_note} deleted'
     else:
         return 'Note not deleted'
@@ -97,7 +102,6 @@ def add_date(*args):
         except ValueError:
             raise DateIsNotValid
     note.execution_date = exec_date
-    session.commit()
     return f'Date {exec_date} added to note ID:{id_note}'
 
 
@@ -105,22 +109,13 @@ def add_date(*args):
 def add_tag(*args):
     id_note = int(args[0])
     session.query(Note).filter(Note.id == id_note).one()  # перевірка на існування
-    note_tags = re.sub(r'[;,.!?]', ' ', ' '.join(args[1:])).title().split()
-    note_tags = list(set(note_tags))
-    # Визначаємо існуючі теги для нотатки
-    all_note_tags = []
-    tag_all = session.query(Tag).filter(Tag.note_id == id_note).all()
-    for tag in tag_all:
-        all_note_tags.append(tag.tag)
-    # Додавання тегів, яких ще немає
-    result_tag = []
-    for tag in note_tags:
-        if not tag in all_note_tags:
-            new_tag = Tag(note_id=id_note, tag=tag)
-            session.add(new_tag)
-            session.commit()
-            result_tag.append(tag)
+    note_tags = set(re.sub(r'[;,.!?]', ' ', ' '.join(args[1:])).title().split())
+    # Визначаємо, яких тегів ще немає у нотатки, і додаємо їх одним запитом
+    exist_tags = {tag for tag, in session.query(Tag.tag).filter(Tag.note_id == id_note, Tag.tag.in_(note_tags))}
+    result_tag = note_tags - exist_tags
     if result_tag:
+        session.execute(dialect_insert(Tag).values([{'note_id': id_note, 'tag': tag} for tag in result_tag])
+                        .on_conflict_do_nothing(index_elements=['note_id', 'tag']))
         return f'Tags {", ".join(sorted(result_tag))} added to note ID:{id_note}'
     else:
         return f'No tags added to note ID:{id_note}'
@@ -132,7 +127,6 @@ def done_note(*args):
     id_note = int(args[0])
     note = session.query(Note).filter(Note.id == id_note).one()  # перевірка на існування
     note.is_done = True
-    session.commit()
     return f'Note ID:{id_note} marked as done'
 
 
@@ -142,48 +136,30 @@ def return_note(*args):
     id_note = int(args[0])
     note = session.query(Note).filter(Note.id == id_note).one()  # перевірка на існування
     note.is_done = False
-    session.commit()
     return f'Note ID:{id_note} marked as not done'
 
 
 def show_all(*args):
     """Повертає всі нотатки"""
-    notes = session.query(Note).filter(not_(Note.is_done)).order_by(Note.id).all()
-    result = 'List of all notes:\n'
-    print_list = Paginator(notes).get_view(func=view_note)
-    for item in print_list:
-        if item is None:
-            return 'No notes found'
-        else:
-            result += f'{item}'
-    return result
+    notes = notes_query().filter(not_(Note.is_done))
+    return Listing('List of all notes:', QueryPaginator(notes, Note.id), view_note, 'No notes found')
 
 
 def show_archiv(*args):
     """Повертає нотатки з архіву"""
-    notes = session.query(Note).filter(Note.is_done).order_by(Note.id).all()
-    result = 'List of all archived notes:\n'
-    print_list = Paginator(notes).get_view(func=view_note)
-    for item in print_list:
-        if item is None:
-            return 'No notes found'
-        else:
-            result += f'{item}'
-    return result
+    notes = notes_query().filter(Note.is_done)
+    return Listing('List of all archived notes:', QueryPaginator(notes, Note.id), view_note, 'No notes found')
 
 
+@InputError
 def find_note(*args):
-    """Повертає нотатки за входженням в текст"""
-    subtext = args[0]
-    notes = session.query(Note).filter(and_(not_(Note.is_done), Note.text.ilike(f'%{subtext}%'))).order_by(Note.id).all()
-    result = f'List of notes with text "{subtext}":\n'
-    print_list = Paginator(notes).get_view(func=view_note)
-    for item in print_list:
-        if item is None:
-            return 'No notes found'
-        else:
-            result += f'{item}'
-    return result
+    """Повертає нотатки, в тексті або тегах яких є всі слова (або їх початки), найрелевантніші першими"""
+    subtext = ' '.join(args)
+    if not subtext:
+        raise IndexError
+    notes, rank = search_notes(notes_query().filter(not_(Note.is_done)), subtext)
+    return Listing(f'List of notes with text "{subtext}":', QueryPaginator(notes, rank, Note.id), view_note,
+                   'No notes found')
 
 
 @InputError
@@ -206,17 +182,9 @@ def show_date(*args):
 
     date1 = exec_date - datetime.timedelta(days=days)
     date2 = exec_date + datetime.timedelta(days=days)
-    notes = session.query(Note).filter(and_(not_(Note.is_done), Note.execution_date >= date1,
-                                            Note.execution_date <= date2)).order_by(Note.id).all()
-
-    result = 'List of notes with date:\n'
-    print_list = Paginator(notes).get_view(func=view_note)
-    for item in print_list:
-        if item is None:
-            return 'No notes found'
-        else:
-            result += f'{item}'
-    return result
+    notes = notes_query().filter(and_(not_(Note.is_done), Note.execution_date >= date1,
+                                      Note.execution_date <= date2))
+    return Listing('List of notes with date:', QueryPaginator(notes, Note.id), view_note, 'No notes found')
 
 
 @InputError
@@ -224,38 +192,22 @@ def find_tag(*args):
     """Повертає нотатки в яких є тег"""
 
     tag_find = args[0]
-    notes = session.query(Note).join(Note.tags).filter(not_(Note.is_done)).filter(Tag.tag.ilike(tag_find)).order_by(Note.id).all()
-
-    result = f'List of notes with tag "{tag_find}":\n'
-    print_list = Paginator(notes).get_view(func=view_note)
-    for item in print_list:
-        if item is None:
-            return 'No notes found'
-        else:
-            result += f'{item}'
-    return result
+    notes = notes_query().join(Note.tags).filter(not_(Note.is_done)).filter(Tag.tag == tag_find.title())
+    return Listing(f'List of notes with tag "{tag_find}":', QueryPaginator(notes, Note.id), view_note, 'No notes found')
 
 
 def sort_by_tags(*args):
-    notes = session.query(Note).join(Note.tags).filter(not_(Note.is_done)).order_by(Tag.tag).all()
-    result = f'List of tag-sorted notes":\n'
-    print_list = Paginator(notes).get_view(func=view_note)
-    for item in print_list:
-        if item is None:
-            return 'No notes found'
-        else:
-            result += f'{item}'
-    return result
+    # Одна нотатка - один запис: сортуємо за першим (найменшим) тегом, а не за кожним тегом окремо
+    first_tags = select(Tag.note_id, func.min(Tag.tag).label('tag')).group_by(Tag.note_id).subquery()
+    notes = notes_query().join(first_tags, Note.id == first_tags.c.note_id).filter(not_(Note.is_done))
+    return Listing(f'List of tag-sorted notes":', QueryPaginator(notes, first_tags.c.tag, Note.id), view_note,
+                   'No notes found')
 
 
 def goodbye(*args):
     return 'You have finished working with notebook'
 
 
-def unknown_command(*args):
-    return 'Unknown command! Enter again!'
-
-
 def help_me(*args):
     """Повертає допомогу по списку команд"""
     return """\nCommand format:
@@ -270,54 +222,40 @@ def help_me(*args):
     show all - show all notes;
     show archived - show archived notes;
     show date <date> [<days>] - show notes by date +- days;
-    find note <text> - find note by text;
+    find note <words> - find notes by words in text or tags (word beginnings match too);
     find tag <text> - find note by tag;
     sort by tags - show all notes sorted by tags;
-    good bye or close or exit or . - exit the program"""
+    good bye or close or exit or . - exit the program""" + TRANSACTION_HELP
 
 
 COMMANDS = {help_me: ['?', 'help'], goodbye: ['good bye', 'close', 'exit', '.'], add_note: ['add note '],
             add_date: ['add date '], show_all: ['show all'], show_archiv: ['show archived'],
             change_note: ['change note '], del_note: ['delete note '], find_note: ['find note '],
             show_date: ['show date '], done_note: ['done '], return_note: ['return '], add_tag: ["add tag"],
-            find_tag: ["find tag"], sort_by_tags: ['sort by tags']}
+            find_tag: ["find tag"], sort_by_tags: ['sort by tags'], **TRANSACTION_COMMANDS}
 
 
-def command_parser(user_command: str) -> (str, list):
-    for key, list_value in COMMANDS.items():
-        for value in list_value:
-            if user_command.lower().startswith(value):
-                args = user_command[len(value):].split()
-                return key, args
-    else:
-        return unknown_command, []
+DISPATCHER = CommandDispatcher(COMMANDS)
 
 
 def start_nb():
     print('\n\033[033mWelcome to notebook!\033[0m')
     print(f"\033[032mType command or '?' for help \033[0m\n")
-    while True:
-        with open("history.txt", "wb"):
-            pass
-        user_command = prompt('Enter command >>> ',
-                              history=FileHistory('history.txt'),
-                              auto_suggest=AutoSuggestFromHistory(),
-                              completer=Completer,
-                              lexer=RainbowLexer()
-                              )
-        command, data = command_parser(user_command)
-        print(command(*data), '\n')
-        if command is goodbye:
-            break
-
-
-Completer = NestedCompleter.from_nested_dict({'help': None, 'good bye': None, 'exit': None,
-                                              'close': None, '?': None, '.': None,
-                                              'add': {'note': None, 'date': None, 'tag': None},
-                                              'show': {'all': None, 'archived': None, 'date': None},
-                                              'change note': None, 'delete note': None,
-                                              'find': {'note': None, 'tag': None}, 'done': None,
-                                              'return': None, 'sort by tags': None})
+    session_prompt = prompt_session('notebook', Completer)
+    try:
+        while True:
+            user_command = prompt_command(session_prompt, 'Enter command >>> ')
+            with session_scope():
+                command, data = DISPATCHER.parse(user_command)
+                print_result(command(*data), release=unit_of_work.release)
+            if command is goodbye:
+                break
+    finally:
+        # Також при Ctrl+C / Ctrl+D: незафіксовані команди пакета не губляться
+        leave_module()
+
+
+Completer = NestedCompleter.from_nested_dict(DISPATCHER.completions())
 
 if __name__ == '__main__':
     start_nb()
@@ -1,51 +1,227 @@
 import re
+import sys
+import unicodedata
 from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from sqlalchemy import tuple_
 
 PAGINATOR_NUMBER = 3  # кількість записів для представлення
 STRING_WIDTH = 80
+STREAM_CHUNK = 500  # записів на запит при потоковому виводі без навігації
+
+HYPHENATION_CACHE = 4096  # кількість перенесених текстів, що зберігаються для повторного виводу
+
+ANSI_ESCAPE = re.compile(r'\033\[[0-9;]*m')
 
 
 class AbstractPaginator(ABC):
 
     @abstractmethod
-    def get_view(self):
+    def get_page(self, number: int) -> (list, bool):
+        """Повертає записи сторінки number (нумерація з 0) та ознаку наявності наступної сторінки"""
         pass
 
+    def get_view(self, func):
+        number = 0
+        while True:
+            records, has_next = self.get_page(number)
+            if not records:
+                if number == 0:
+                    yield None
+                return
+            yield render_page(records, func)
+            if not has_next:
+                return
+            number += 1
+
+    def records(self):
+        """Усі записи по черзі, сторінка за сторінкою"""
+        number, has_next = 0, True
+        while has_next:
+            page, has_next = self.get_page(number)
+            yield from page
+            number += 1
+
 
 class Paginator(AbstractPaginator):
+    """Посторінкове представлення вже отриманих даних"""
+
     def __init__(self, data):
-        self.data = data
+        self.data = data if isinstance(data, list) else list(data)
 
-    def get_view(self, func):
-        index, print_block = 1, '=' * STRING_WIDTH + '\n'
-        is_empty = True
-        data_values = self.data
-        for record in data_values:
-            is_empty = False
-            print_block += func(record) + '\n' + '-' * STRING_WIDTH + '\n'
-            if index < PAGINATOR_NUMBER:
-                index += 1
-            else:
-                yield print_block
-                index, print_block = 1, '=' * STRING_WIDTH + '\n'
-        if is_empty:
-            yield None
-        else:
-            yield print_block
-
-
-def hyphenation_string(text) -> str:
-    result, line = '', ''
-    text_list = text.split()
-    for word in text_list:
-        if not line:
-            line = word
-        elif len(line) + len(word) > STRING_WIDTH + 1:
-            result += line + '\n'
-            line = word
-        else:
-            line += ' ' + word
+    def get_page(self, number: int) -> (list, bool):
+        start = number * PAGINATOR_NUMBER
+        return self.data[start:start + PAGINATOR_NUMBER], start + PAGINATOR_NUMBER < len(self.data)
+
+    def records(self):
+        return iter(self.data)
+
+
+class QueryPaginator(AbstractPaginator):
+    """Посторінкова вибірка з бази даних.
+
+    Кожна сторінка - окремий запит з LIMIT та умовою (keys) > (ключ останнього запису попередньої сторінки),
+    тому вартість сторінки не залежить від її номера і від розміру таблиці. Ключі мають бути унікальними
+    в межах вибірки (наприклад Contact.name або Note.id).
+    """
+
+    def __init__(self, query, *keys):
+        self.keys = keys
+        self.query = query.add_columns(*keys).order_by(*keys)
+        # Нижні межі вже переглянутих сторінок: bounds[n] - ключ останнього запису сторінки n - 1
+        self.bounds = [None]
+
+    def after(self, bound):
+        """Запит записів, ключ яких більший за bound (None - з початку)"""
+        if bound is None:
+            return self.query
+        if len(self.keys) == 1:
+            return self.query.filter(self.keys[0] > bound[0])
+        return self.query.filter(tuple_(*self.keys) > tuple_(*bound))
+
+    def get_page(self, number: int) -> (list, bool):
+        if number >= len(self.bounds):
+            raise IndexError(f'Page {number} is not reached yet')
+        # Беремо на один запис більше, щоб знати, чи є наступна сторінка
+        rows = self.after(self.bounds[number]).limit(PAGINATOR_NUMBER + 1).all()
+        has_next = len(rows) > PAGINATOR_NUMBER
+        rows = rows[:PAGINATOR_NUMBER]
+        if has_next:
+            del self.bounds[number + 1:]
+            self.bounds.append(tuple(rows[-1][1:]))
+        return [row[0] for row in rows], has_next
+
+    def records(self):
+        # Ті самі keyset-запити, але по STREAM_CHUNK записів: пам'ять - один пакет, незалежно від розміру вибірки
+        bound = None
+        while True:
+            rows = self.after(bound).limit(STREAM_CHUNK).all()
+            yield from (row[0] for row in rows)
+            if len(rows) < STREAM_CHUNK:
+                return
+            bound = tuple(rows[-1][1:])
+
+
+class Listing:
+    """Результат команди, який виводиться посторінково"""
+
+    def __init__(self, title: str, paginator: AbstractPaginator, func, empty: str):
+        self.title = title
+        self.paginator = paginator
+        self.func = func
+        self.empty = empty
+
+
+def iter_page(records, func):
+    """Частини тексту сторінки по одному запису, без складання всієї сторінки в один рядок"""
+    separator = '-' * STRING_WIDTH + '\n'
+    yield '=' * STRING_WIDTH + '\n'
+    for record in records:
+        yield func(record) + '\n' + separator
+
+
+def render_page(records, func) -> str:
+    return ''.join(iter_page(records, func))
+
+
+def stream_listing(result: Listing, out):
+    """Виводить усі записи Listing без навігації (вивід не в термінал: файл, pipe, pager)"""
+    chunks = iter_page(result.paginator.records(), result.func)
+    separator = next(chunks)
+    first = next(chunks, None)
+    if first is None:
+        out.write(result.empty + ' \n\n')
+        return
+    out.write(result.title + '\n')
+    out.write(separator)
+    out.write(first)
+    # Буфер out сам об'єднує дрібні записи, тож перший запис з'являється одразу, а пам'ять не росте
+    out.writelines(chunks)
+    out.write('\n')
+
+
+def print_result(result, out=None, release=None):
+    """Виводить результат команди; сторінки Listing виводяться по мірі отримання з навігацією.
+
+    release викликається, коли сторінку вже виведено, перед очікуванням відповіді користувача
+    (наприклад, щоб завершити транзакцію бази).
+    """
+    out = out or sys.stdout
+    if not isinstance(result, Listing):
+        out.write(f'{result} \n\n')
+        out.flush()
+        return
+    if not out.isatty():
+        stream_listing(result, out)
+        out.flush()
+        return
+    number = 0
+    records, has_next = result.paginator.get_page(number)
+    if not records:
+        out.write(result.empty + ' \n\n')
+        out.flush()
+        return
+    out.write(result.title + '\n')
+    while True:
+        # Сторінка складається повністю, поки записи ще в сесії, - після release їх уже не дочитати
+        out.write(render_page(records, result.func))
+        out.flush()
+        if not has_next and number == 0:
+            break
+        if release is not None:
+            release()
+        answer = input(f'Page {number + 1}. Enter - next page, p - previous, q - quit >>> ').strip().lower()
+        if answer == 'q' or (not answer and not has_next):
+            break
+        if answer == 'p':
+            number = max(number - 1, 0)
+        elif has_next:
+            number += 1
+        records, has_next = result.paginator.get_page(number)
+    out.write('\n')
+    out.flush()
+
+
+@lru_cache(maxsize=HYPHENATION_CACHE)
+def hyphenation_string(text: str, width: int = STRING_WIDTH) -> str:
+    """Переносить текст по словах у рядки не ширші за width видимих символів.
+
+    Кольорові escape-послідовності не займають місця, широкі символи (CJK, emoji) займають два.
+    Результат кешується: ті самі поля показуються знову при перегляді сторінок.
+    """
+    # Звичайний ASCII-текст без escape-послідовностей: ширина слова - його довжина, без кешу ширин
+    measure = len if text.isascii() and '\033' not in text else visible_width
+    lines, line, line_width = [], [], -1
+    for word in text.split():
+        word_width = measure(word)
+        if line and line_width + 1 + word_width > width:
+            lines.append(' '.join(line))
+            line, line_width = [], -1
+        line.append(word)
+        line_width += 1 + word_width
     if line:
-        result += line
-    return result
+        lines.append(' '.join(line))
+    return '\n'.join(lines)
+
+
+@lru_cache(maxsize=65536)
+def visible_width(word: str) -> int:
+    """Ширина слова в терміналі"""
+    if '\033' in word:
+        word = ANSI_ESCAPE.sub('', word)
+    if word.isascii():
+        return len(word)
+    return sum(char_width(char) for char in word)
+
+
+@lru_cache(maxsize=None)
+def char_width(char: str) -> int:
+    if unicodedata.combining(char) or unicodedata.category(char) in ('Mn', 'Me', 'Cf'):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
 
+def strip_ansi(text: str) -> str:
+    """Текст без кольорових escape-послідовностей терміналу"""
+    return ANSI_ESCAPE.sub('', text)
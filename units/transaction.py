@@ -0,0 +1,68 @@
+"""Команди керування транзакціями, спільні для адресної книги та нотатника"""
+import asyncio
+
+from prompt_toolkit import PromptSession
+
+from src.db import session_scope, unit_of_work
+
+
+def batch_mode(*args):
+    """Вмикає пакетний режим (batch [<N>] [<seconds>]) або вимикає його (batch off)"""
+    if args and args[0].lower() == 'off':
+        return f'Batch mode off, {unit_of_work.stop_batch()} command(s) committed'
+    try:
+        size = int(args[0]) if args else 100
+        timeout = float(args[1]) if len(args) > 1 else None
+        unit_of_work.start_batch(size, timeout)
+    except ValueError:
+        return 'Error! Incorrect argument!'
+    return f'Batch mode on: commit every {size} command(s)' + (f' or {timeout:g} s' if timeout else '')
+
+
+def commit_batch(*args):
+    return f'{unit_of_work.commit()} command(s) committed'
+
+
+def rollback_batch(*args):
+    return f'{unit_of_work.rollback()} command(s) rolled back'
+
+
+def prompt_command(session_prompt: PromptSession, message: str) -> str:
+    """Введення команди модуля.
+
+    Пакет з таймером (batch N seconds) фіксується вчасно і тоді, коли програма чекає на введення, а не лише
+    перед наступною командою: інакше незафіксована транзакція (і блокування SQLite) тримається, доки
+    користувач не введе команду. Таймер працює в циклі подій prompt_toolkit, у тому ж потоці, що й команди.
+    """
+    timers = []
+
+    def start_timer():
+        delay = unit_of_work.expires_in()
+        if delay is not None:
+            timers.append(asyncio.get_running_loop().call_later(delay, unit_of_work.commit_expired))
+
+    with session_scope():
+        unit_of_work.commit_expired()
+    try:
+        return session_prompt.prompt(message, pre_run=start_timer)
+    finally:
+        for timer in timers:
+            timer.cancel()
+
+
+def leave_module():
+    """Вихід з модуля (good bye, Ctrl+C, Ctrl+D): незафіксовані команди пакета фіксуються, пакетний режим
+    вимикається, тож інший модуль починає з фіксації кожної команди"""
+    with session_scope():
+        committed = unit_of_work.stop_batch()
+        if committed:
+            print(f'{committed} pending command(s) committed')
+
+
+TRANSACTION_COMMANDS = {batch_mode: ['batch'], commit_batch: ['commit'], rollback_batch: ['rollback']}
+
+TRANSACTION_HELP = """
+    batch [<N>] [<seconds>] - run next commands in one transaction, commit every N commands (100) or seconds;
+    batch off - commit pending commands and return to commit per command;
+    commit - commit pending commands;
+    rollback - discard pending commands"""